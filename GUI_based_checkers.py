@@ -1,12 +1,18 @@
+import os
 import pygame
 from checkers.checkers_constant import WIDTH, HEIGHT, SQUARE_SIZE, YELLOW, WHITE
 from checkers.checkers_game import Game
-from minimax.checkers_algorithm import minimax_algorithm
+from checkers.checkers_bitboard import BitBoard
+from minimax.checkers_worker import AIWorker
 
 FPS = 60
-
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('Checkers')
+AI_TIME_MS = 1000
+PONDER = True
+BOOK_PATH = 'opening_book.bin'
+TABLEBASE_DIR = 'tablebase'
+# Set CHECKERS_CACHE=analysis_cache.db to keep the AI's results between launches.
+CACHE_PATH = os.environ.get('CHECKERS_CACHE')
+CACHE_DEPTH = 8
 
 def get_row_col_from_mouse(pos):
     x, y = pos
@@ -17,14 +23,19 @@ def get_row_col_from_mouse(pos):
 def main():
     run = True
     clock = pygame.time.Clock()
-    game = Game(WIN)
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('Checkers')
+    book_path = BOOK_PATH if os.path.exists(BOOK_PATH) else None
+    tablebase_dir = TABLEBASE_DIR if os.path.isdir(TABLEBASE_DIR) else None
+    game = Game(win, BitBoard, AIWorker(AI_TIME_MS, book_path, tablebase_dir, CACHE_PATH, CACHE_DEPTH))
 
     while run:
         clock.tick(FPS)
 
         if game.turn == WHITE :
-            value, new_board = minimax_algorithm(game.get_board(), 3, WHITE, game)
-            game.ai_move(new_board)
+            game.poll_ai()
+        elif PONDER:
+            game.ponder_ai()
 
         if game.winner() != None:
             print(game.winner())
@@ -33,14 +44,19 @@ def main():
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
+
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                game.invalidate()
             
-            if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.type == pygame.MOUSEBUTTONDOWN and game.turn != WHITE:
                 pos = pygame.mouse.get_pos()
                 row, col = get_row_col_from_mouse(pos)
                 game.select(row, col)
 
         game.update()
     
+    game.close()
     pygame.quit()
 
-main()
\ No newline at end of file
+if __name__ == '__main__':
+    main()
\ No newline at end of file
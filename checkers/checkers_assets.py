@@ -0,0 +1,44 @@
+import os
+from .checkers_constant import WIDTH, HEIGHT, ROWS, COLS, SQUARE_SIZE, YELLOW, BLACK
+
+"""
+
+Rendering assets, loaded on first use. Nothing here imports pygame until a
+piece is actually drawn, so the rules and the engine can be imported by
+headless processes without paying for pygame. Assets are found next to this
+file, whatever the working directory is.
+
+crown_image(): Returns the crown drawn on king pieces, scaled to 44x25.
+
+board_background(): Returns the empty checkerboard as a WIDTH x HEIGHT
+surface, drawn once and then blitted instead of drawing the 32 squares
+every frame.
+
+"""
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+CROWN_SIZE = (44, 25)
+
+_crown_image = None
+_board_background = None
+
+
+def crown_image():
+    global _crown_image
+    if _crown_image is None:
+        import pygame
+        _crown_image = pygame.transform.scale(pygame.image.load(os.path.join(ASSETS_DIR, 'crown.jpg')), CROWN_SIZE)
+    return _crown_image
+
+
+
+def board_background():
+    global _board_background
+    if _board_background is None:
+        import pygame
+        _board_background = pygame.Surface((WIDTH, HEIGHT))
+        _board_background.fill(BLACK)
+        for row in range(ROWS):
+            for col in range(row % 2, COLS, 2):
+                pygame.draw.rect(_board_background, YELLOW, (row*SQUARE_SIZE, col*SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+    return _board_background
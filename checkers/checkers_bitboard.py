@@ -0,0 +1,462 @@
+from .checkers_constant import ROWS, YELLOW, WHITE
+from .checkers_board import Board
+from .checkers_board_pieces import Piece
+from .checkers_zobrist import PIECE_KEYS, WHITE_MAN, WHITE_KING, YELLOW_MAN, YELLOW_KING
+from .checkers_evaluation import SCALE, VALUES, KINDS, masks_value
+from .checkers_squares import (SQUARES, UP_DIRECTIONS, DOWN_DIRECTIONS, DIRECTIONS, NEIGHBOR,
+                               OPPOSITE, ROW_OF, TOP_ROW, BOTTOM_ROW, FULL_MASK,
+                               square_of, row_col, shift, iter_bits, can_move)
+
+"""
+
+BitBoard is a drop-in replacement for Board that keeps the position in three
+32-bit masks over the dark squares (see checkers_squares): one for the WHITE
+pieces, one for the YELLOW pieces and one for the kings of either color.
+
+It exposes the same surface as Board (get_valid_moves, move, remove, winner,
+evaluate, get_all_pieces, get_piece, draw) so Game and the minimax code can
+use it unchanged. Pieces handed out by that surface are short-lived Piece
+views built from the masks; the board itself stores no Piece objects.
+
+The engine-facing API works on plain tuples instead: get_all_moves returns
+(from_square, to_square, captured_mask) moves in the same order as the
+legacy generator, and apply_move/successors build the resulting positions.
+
+Move generation follows the rules implemented by Board.get_valid_moves
+exactly, including their corner cases, so both boards always produce the
+same moves:
+
+* men and kings step one square; a jump captures one adjacent opponent.
+* a jump may continue only in the same vertical direction (left or right),
+  and every landing square along the way is a separate move.
+* a continued jump lists only the last two captured pieces.
+* a continued jump moving up can not land on row 0.
+
+The piece counters (white_left, red_left, white_kings, red_kings) are kept the
+same way Board keeps them, and zobrist and evaluation hold the same
+incrementally updated hash and score as Board.zobrist and Board.evaluation,
+so evaluate() returns identical scores.
+
+"""
+
+class BitBoard:
+    __slots__ = ('white', 'yellow', 'kings', 'white_left', 'red_left', 'white_kings', 'red_kings', 'zobrist',
+                 'evaluation')
+
+    START_WHITE = (1 << 12) - 1
+    START_YELLOW = FULL_MASK ^ ((1 << 20) - 1)
+
+    def __init__(self):
+        self.white = self.START_WHITE
+        self.yellow = self.START_YELLOW
+        self.kings = 0
+        self.red_left = self.white_left = 12
+        self.red_kings = self.white_kings = 0
+        self.zobrist = self._compute_zobrist()
+        self.evaluation = masks_value(self.white, self.yellow, self.kings)
+
+    """
+
+    from_board(cls, board): Class method that builds a BitBoard holding the
+    same position and piece counters as a list-of-lists Board.
+
+    copy(self): Method that returns an independent copy of the board. It is
+    also used by copy.deepcopy, so existing code that deep-copies boards
+    stays cheap.
+
+    """
+
+    @classmethod
+    def from_board(cls, board):
+        bitboard = cls.__new__(cls)
+        bitboard.white = bitboard.yellow = bitboard.kings = 0
+        for row in range(ROWS):
+            for piece in board.board[row]:
+                if piece == 0:
+                    continue
+                bit = 1 << square_of(piece.row, piece.col)
+                if piece.color == WHITE:
+                    bitboard.white |= bit
+                else:
+                    bitboard.yellow |= bit
+                if piece.king:
+                    bitboard.kings |= bit
+        bitboard.white_left = board.white_left
+        bitboard.red_left = board.red_left
+        bitboard.white_kings = board.white_kings
+        bitboard.red_kings = board.red_kings
+        bitboard.zobrist = bitboard._compute_zobrist()
+        bitboard.evaluation = masks_value(bitboard.white, bitboard.yellow, bitboard.kings)
+        return bitboard
+
+    def copy(self):
+        board = BitBoard.__new__(BitBoard)
+        board.white = self.white
+        board.yellow = self.yellow
+        board.kings = self.kings
+        board.white_left = self.white_left
+        board.red_left = self.red_left
+        board.white_kings = self.white_kings
+        board.red_kings = self.red_kings
+        board.zobrist = self.zobrist
+        board.evaluation = self.evaluation
+        return board
+
+    def __deepcopy__(self, memo):
+        return self.copy()
+
+    def _compute_zobrist(self):
+        zobrist = 0
+        for kind, mask in ((WHITE_MAN, self.white & ~self.kings), (WHITE_KING, self.white & self.kings),
+                           (YELLOW_MAN, self.yellow & ~self.kings), (YELLOW_KING, self.yellow & self.kings)):
+            for sq in iter_bits(mask):
+                zobrist ^= PIECE_KEYS[kind][sq]
+        return zobrist
+
+    """
+
+    pack(self): Method that returns the position as a tuple of seven ints
+    (white, yellow, kings, white_left, red_left, white_kings, red_kings).
+    It is much smaller to pickle than a Board and is the form positions take
+    when they are sent to other processes.
+
+    unpack(cls, packed): Class method that rebuilds a BitBoard from pack().
+
+    """
+
+    def pack(self):
+        return (self.white, self.yellow, self.kings, self.white_left, self.red_left,
+                self.white_kings, self.red_kings)
+
+    @classmethod
+    def unpack(cls, packed):
+        board = cls.__new__(cls)
+        (board.white, board.yellow, board.kings, board.white_left, board.red_left,
+         board.white_kings, board.red_kings) = packed
+        board.zobrist = board._compute_zobrist()
+        board.evaluation = masks_value(board.white, board.yellow, board.kings)
+        return board
+
+    """
+
+    encode(self), decode(cls, data): Methods that convert to and from the
+    32-byte form of Board.encode, so both boards can read each other's
+    positions. decode sets the counters like Board.decode.
+
+    """
+
+    def encode(self):
+        codes = bytearray(SQUARES)
+        for kind, mask in zip(KINDS, (self.white & ~self.kings, self.white & self.kings,
+                                      self.yellow & ~self.kings, self.yellow & self.kings)):
+            for sq in iter_bits(mask):
+                codes[sq] = kind + 1
+        return bytes(codes)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) != SQUARES:
+            raise ValueError('an encoded position has %d bytes, not %d' % (SQUARES, len(data)))
+        masks = [0, 0, 0, 0]
+        for sq, code in enumerate(data):
+            if code:
+                masks[code - 1] |= 1 << sq
+        white, yellow = masks[WHITE_MAN] | masks[WHITE_KING], masks[YELLOW_MAN] | masks[YELLOW_KING]
+        return cls.unpack((white, yellow, masks[WHITE_KING] | masks[YELLOW_KING], bin(white).count('1'),
+                           bin(yellow).count('1'), bin(masks[WHITE_KING]).count('1'),
+                           bin(masks[YELLOW_KING]).count('1')))
+
+    draw_squares = Board.draw_squares
+
+    def evaluate(self):
+        return self.evaluation / SCALE
+
+    """
+
+    winner(self, color=None), has_legal_move(self, color): Methods that work
+    like Board.winner and Board.has_legal_move.
+
+    """
+
+    def winner(self, color=None):
+        if self.red_left <= 0:
+            return WHITE
+        elif self.white_left <= 0:
+            return YELLOW
+        elif color is not None and not self.has_legal_move(color):
+            return YELLOW if color == WHITE else WHITE
+
+        return None
+
+    def has_legal_move(self, color):
+        empty = FULL_MASK & ~(self.white | self.yellow)
+        if color == WHITE:
+            return can_move(self.white & self.kings, self.white, self.yellow, empty)
+        return can_move(self.yellow, self.yellow & self.kings, self.white, empty)
+
+    """
+
+    get_piece(self, row, col), get_all_pieces(self, color): Methods that return
+    Piece views of the pieces on the board, in the same format as Board.
+    Changing a view does not change the board; use move and remove instead.
+
+    """
+
+    def _piece_at(self, sq):
+        bit = 1 << sq
+        if self.white & bit:
+            color = WHITE
+        elif self.yellow & bit:
+            color = YELLOW
+        else:
+            return 0
+        row, col = row_col(sq)
+        piece = Piece(row, col, color)
+        if self.kings & bit:
+            piece.make_king()
+        return piece
+
+    def get_piece(self, row, col):
+        sq = square_of(row, col)
+        if sq < 0:
+            return 0
+        return self._piece_at(sq)
+
+    def get_all_pieces(self, color):
+        mask = self.white if color == WHITE else self.yellow
+        return [self._piece_at(sq) for sq in iter_bits(mask)]
+
+    def move(self, piece, row, col):
+        source = square_of(piece.row, piece.col)
+        target = square_of(row, col)
+        self._move_bits(source, target)
+        piece.move(row, col)
+
+        if row == ROWS - 1 or row == 0:
+            piece.make_king()
+
+    def remove(self, pieces):
+        mask = 0
+        for piece in pieces:
+            if piece != 0:
+                mask |= 1 << square_of(piece.row, piece.col)
+        self._remove_bits(mask)
+
+    def draw(self, win):
+        self.draw_squares(win)
+        for sq in range(SQUARES):
+            piece = self._piece_at(sq)
+            if piece != 0:
+                piece.draw(win)
+
+    """
+
+    get_valid_moves(self, piece): Method that returns the valid moves of a
+    piece as a dictionary mapping (row, col) to the list of pieces jumped,
+    exactly like Board.get_valid_moves.
+
+    """
+
+    def get_valid_moves(self, piece):
+        color = piece.color
+        moves = self._square_moves(square_of(piece.row, piece.col), color, self._movable(color))
+        result = {}
+        for target, captured in moves.items():
+            result[row_col(target)] = [self._piece_at(sq) for sq in iter_bits(captured)]
+        return result
+
+    """
+
+    get_all_moves(self, color): Method that returns every move of the given
+    color as (from_square, to_square, captured_mask) tuples, ordered like the
+    boards produced by minimax.get_all_moves_board for a Board.
+
+    apply_move(self, move): Method that returns a new board with the move
+    played. successors(self, color) returns the boards for all moves.
+
+    make_move(self, move), unmake_move(self, undo): Methods that play a move in
+    place and take it back, like Board.make_move/unmake_move. The undo record
+    is the previous masks, counters and hash.
+
+    is_promotion(self, move): Method that returns True if the move crowns a piece.
+
+    child_masks(self, move): Method that returns the (white, yellow, kings)
+    masks of the position after move without playing it, for code that only
+    needs to look at the children of a position.
+
+    """
+
+    def get_all_moves(self, color):
+        movable = self._movable(color)
+        moves = []
+        for sq in iter_bits(movable[0]):
+            for target, captured in self._square_moves(sq, color, movable).items():
+                moves.append((sq, target, captured))
+        return moves
+
+    def apply_move(self, move):
+        board = self.copy()
+        board._move_bits(move[0], move[1])
+        if move[2]:
+            board._remove_bits(move[2])
+        return board
+
+    def successors(self, color):
+        return [self.apply_move(move) for move in self.get_all_moves(color)]
+
+    def make_move(self, move):
+        undo = (self.white, self.yellow, self.kings, self.white_left, self.red_left,
+                self.white_kings, self.red_kings, self.zobrist, self.evaluation)
+        self._move_bits(move[0], move[1])
+        if move[2]:
+            self._remove_bits(move[2])
+        return undo
+
+    def unmake_move(self, undo):
+        (self.white, self.yellow, self.kings, self.white_left, self.red_left,
+         self.white_kings, self.red_kings, self.zobrist, self.evaluation) = undo
+
+    def is_promotion(self, move):
+        return bool((1 << move[1]) & (TOP_ROW | BOTTOM_ROW)) and not self.kings & (1 << move[0])
+
+    def child_masks(self, move):
+        source_bit, target_bit = 1 << move[0], 1 << move[1]
+        white, yellow, kings = self.white, self.yellow, self.kings
+        if white & source_bit:
+            white ^= source_bit | target_bit
+        else:
+            yellow ^= source_bit | target_bit
+        if kings & source_bit:
+            kings ^= source_bit | target_bit
+        elif target_bit & (TOP_ROW | BOTTOM_ROW):
+            kings |= target_bit
+        keep = ~move[2]
+        return white & keep, yellow & keep, kings & keep
+
+    def _move_bits(self, source, target):
+        source_bit = 1 << source
+        target_bit = 1 << target
+        white = bool(self.white & source_bit)
+        if white:
+            self.white ^= source_bit | target_bit
+            kind = WHITE_MAN
+        else:
+            self.yellow ^= source_bit | target_bit
+            kind = YELLOW_MAN
+        if self.kings & source_bit:
+            self.kings ^= source_bit | target_bit
+            kind += 1
+        self.zobrist ^= PIECE_KEYS[kind][source]
+        self.evaluation -= VALUES[kind][source]
+
+        if target_bit & (TOP_ROW | BOTTOM_ROW):
+            self.kings |= target_bit
+            kind |= 1
+            if white:
+                self.white_kings += 1
+            else:
+                self.red_kings += 1
+        self.zobrist ^= PIECE_KEYS[kind][target]
+        self.evaluation += VALUES[kind][target]
+
+    def _remove_bits(self, mask):
+        for sq in iter_bits(mask):
+            bit = 1 << sq
+            kind = WHITE_MAN if self.white & bit else YELLOW_MAN
+            if self.kings & bit:
+                kind += 1
+            self.zobrist ^= PIECE_KEYS[kind][sq]
+            self.evaluation -= VALUES[kind][sq]
+        self.red_left -= bin(self.yellow & mask).count('1')
+        self.white_left -= bin(self.white & mask).count('1')
+        self.white &= ~mask
+        self.yellow &= ~mask
+        self.kings &= ~mask
+
+    """
+
+    _movable(self, color): Private helper that computes, with shifts over the
+    whole side at once, which pieces can step or jump in each direction.
+    It returns (any_mask, step_masks, jump_masks, own, opponent, occupied)
+    where the per-direction masks are indexed by direction.
+
+    """
+
+    def _movable(self, color):
+        if color == WHITE:
+            own, opponent = self.white, self.yellow
+            up_movers, down_movers = own & self.kings, own
+        else:
+            own, opponent = self.yellow, self.white
+            up_movers, down_movers = own, own & self.kings
+        occupied = own | opponent
+        empty = FULL_MASK & ~occupied
+
+        steps = [0, 0, 0, 0]
+        jumps = [0, 0, 0, 0]
+        any_mask = 0
+        for directions, movers in ((UP_DIRECTIONS, up_movers), (DOWN_DIRECTIONS, down_movers)):
+            if not movers:
+                continue
+            for direction in directions:
+                back = OPPOSITE[direction]
+                steps[direction] = movers & shift(empty, back)
+                jumps[direction] = movers & shift(opponent & shift(empty, back), back)
+                any_mask |= steps[direction] | jumps[direction]
+        return any_mask, steps, jumps, own, opponent, occupied
+
+    """
+
+    _square_moves(self, sq, color, movable): Private helper that returns the
+    moves of the piece on sq as a dictionary of to_square -> captured_mask.
+    Multi-jumps are followed by _continue_jump in the same order as
+    Board._continue_jumps.
+
+    """
+
+    def _square_moves(self, sq, color, movable):
+        _, steps, jumps, own, opponent, occupied = movable
+        bit = 1 << sq
+        moves = {}
+        for direction in DIRECTIONS:
+            if steps[direction] & bit:
+                moves[NEIGHBOR[direction][sq]] = 0
+            elif jumps[direction] & bit:
+                jumped = NEIGHBOR[direction][sq]
+                landing = NEIGHBOR[direction][jumped]
+                moves[landing] = 1 << jumped
+                up = direction in UP_DIRECTIONS
+                self._continue_jump(landing, UP_DIRECTIONS if up else DOWN_DIRECTIONS, 1 << jumped,
+                                    moves, opponent, occupied)
+        return moves
+
+    def _continue_jump(self, sq, directions, last, moves, opponent, occupied):
+        for direction in directions:
+            jumped = NEIGHBOR[direction][sq]
+            if jumped < 0 or not opponent & (1 << jumped):
+                continue
+            landing = NEIGHBOR[direction][jumped]
+            if landing < 0 or occupied & (1 << landing):
+                continue
+            if directions is UP_DIRECTIONS and ROW_OF[landing] == 0:
+                continue
+            moves[landing] = (1 << jumped) | last
+            self._continue_jump(landing, directions, 1 << jumped, moves, opponent, occupied)
+
+
+"""
+
+convert_move(board, move, color): Function that returns the move of board (a
+Board or any board with get_all_moves) matching a BitBoard move of color,
+or None if board has no such move. A BitBoard move is returned unchanged.
+
+"""
+
+def convert_move(board, move, color):
+    if isinstance(board, BitBoard):
+        return move
+    start, end = row_col(move[0]), row_col(move[1])
+    for candidate in board.get_all_moves(color):
+        if candidate[0] == start and candidate[1] == end:
+            return candidate
+    return None
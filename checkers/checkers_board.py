@@ -1,64 +1,81 @@
-import pygame
-from .checkers_constant import BLACK, ROWS, YELLOW, SQUARE_SIZE, COLS, WHITE
+from copy import deepcopy
+from .checkers_constant import ROWS, YELLOW, COLS, WHITE
 from .checkers_board_pieces import Piece
+from .checkers_assets import board_background
+from .checkers_zobrist import WHITE_MAN, WHITE_KING, YELLOW_KING, piece_key, piece_kind
+from .checkers_evaluation import SCALE, piece_value
+from .checkers_squares import (SQUARES, FULL_MASK, UP_DIRECTIONS, DOWN_DIRECTIONS, NEIGHBOR_RC, JUMP, JUMP_RC,
+                               square_of, row_col, mask_cells, can_move)
 
 class Board:
     def __init__(self):
         self.board = []
         self.red_left = self.white_left = 12
         self.red_kings = self.white_kings = 0
+        self.zobrist = 0
+        self.evaluation = 0
+        self.white_squares = self.yellow_squares = self.king_squares = 0
         self.create_board()
 
     """
     
     draw_squares(self, win): Method that draws the yellow and black squares on the board using Pygame.
+    The squares are drawn once to a cached surface (see checkers_assets) that is then
+    blitted, and pygame is imported on first use so the board can be used without it.
 
     
     """
     
     def draw_squares(self, win):
-        win.fill(BLACK)
-        for row in range(ROWS):
-            for col in range(row % 2, COLS, 2):
-                pygame.draw.rect(win, YELLOW, (row*SQUARE_SIZE, col *SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE))
+        win.blit(board_background(), (0, 0))
 
     """
     
-    evaluate(self): Method that calculates and returns the 
-    current score of the board based on the number of pieces and kings for each color.
+    evaluate(self): Method that returns the current score of the board: the
+    weighted material, king and positional terms of checkers_evaluation,
+    which move, remove and crowning keep up to date in self.evaluation.
 
     
     """
     
     def evaluate(self) :
-        return self.white_left - self.red_left + (self.white_kings * 0.5 - self.red_kings * 0.5)
+        return self.evaluation / SCALE
     
 
     """
     
     get_all_pieces(self, color): Method that returns a list of all the pieces on the board for a given color.
+    It only visits the squares set in that color's square mask (see move), in the same row-major order
+    as a scan of the whole board.
     
     """
     
     def get_all_pieces(self, color):
-        pieces = []
-        for row in self.board:
-            for piece in row :
-                if piece != 0 and piece.color == color :
-                    pieces.append(piece)
-        return pieces
+        board = self.board
+        return [board[row][col] for row, col in mask_cells(self.white_squares if color == WHITE else self.yellow_squares)]
     
     """
     
     move(self, piece, row, col): Method that updates the board 
     and the piece position when a piece is moved to a new location. 
     If the piece reaches the last row of the opponent's side, the piece is promoted to a king.
+    Besides the grid, the board keeps the squares (see checkers_squares) of the WHITE pieces, 
+    the YELLOW pieces and the kings as bit masks: white_squares, yellow_squares and king_squares. 
+    move, remove and create_board keep them up to date.
 
     
     """
 
     def move(self, piece, row, col):
         self.board[piece.row][piece.col], self.board[row][col] = self.board[row][col], self.board[piece.row][piece.col]
+        self.zobrist ^= piece_key(piece)
+        self.evaluation -= piece_value(piece)
+        source, target = 1 << (4 * piece.row + piece.col // 2), 1 << (4 * row + col // 2)
+        if piece.color == WHITE:
+            self.white_squares ^= source | target
+        else:
+            self.yellow_squares ^= source | target
+        self.king_squares &= ~source
         piece.move(row, col)
 
         if row == ROWS - 1 or row == 0:
@@ -67,6 +84,10 @@ class Board:
                 self.white_kings += 1
             else:
                 self.red_kings += 1 
+        if piece.king:
+            self.king_squares |= target
+        self.zobrist ^= piece_key(piece)
+        self.evaluation += piece_value(piece)
         
     """
     
@@ -82,6 +103,7 @@ class Board:
     
     create_board(self): Method that creates the initial configuration of 
     the board with the appropriate pieces in their starting positions
+    and computes its Zobrist hash and evaluation, which move and remove then keep up to date.
     
     """
 
@@ -98,6 +120,13 @@ class Board:
                         self.board[row].append(0)
                 else:
                     self.board[row].append(0)
+                if self.board[row][col] != 0:
+                    self.zobrist ^= piece_key(self.board[row][col])
+                    self.evaluation += piece_value(self.board[row][col])
+                    if row < 3:
+                        self.white_squares |= 1 << square_of(row, col)
+                    else:
+                        self.yellow_squares |= 1 << square_of(row, col)
     
     """
     
@@ -125,6 +154,12 @@ class Board:
         for piece in pieces:
             self.board[piece.row][piece.col] = 0
             if piece != 0:
+                bit = 1 << (4 * piece.row + piece.col // 2)
+                self.white_squares &= ~bit
+                self.yellow_squares &= ~bit
+                self.king_squares &= ~bit
+                self.zobrist ^= piece_key(piece)
+                self.evaluation -= piece_value(piece)
                 if piece.color == YELLOW:
                     self.red_left -= 1
                 else:
@@ -132,119 +167,236 @@ class Board:
     
     """
     
-    winner(self): Method that checks if a 
+    winner(self, color=None): Method that checks if a 
     color has won the game based on whether the other color has any remaining pieces.
+    Given the color to move, it also counts a side that has pieces but no legal move as lost.
+
+    has_legal_move(self, color): Method that returns True if color has at least one move. 
+    It works on the square masks, so it costs the same however many pieces there are 
+    and is much cheaper than generating the moves.
 
     
     """
     
-    def winner(self):
+    def winner(self, color=None):
         if self.red_left <= 0:
             return WHITE
         elif self.white_left <= 0:
             return YELLOW
+        elif color is not None and not self.has_legal_move(color):
+            return YELLOW if color == WHITE else WHITE
         
         return None 
+
+    def has_legal_move(self, color):
+        empty = FULL_MASK & ~(self.white_squares | self.yellow_squares)
+        if color == WHITE:
+            return can_move(self.white_squares & self.king_squares, self.white_squares, self.yellow_squares, empty)
+        return can_move(self.yellow_squares, self.yellow_squares & self.king_squares, self.white_squares, empty)
     
     """
+
+    __deepcopy__(self, memo): Method that copies the board for deepcopy, which 
+    get_all_moves_board and apply_move call for every move. Only the grid and 
+    its pieces need copying; the other attributes are numbers.
+
+    """
+
+    def __deepcopy__(self, memo):
+        board = self.__class__.__new__(self.__class__)
+        board.__dict__.update(self.__dict__)
+        board.board = [[0 if piece == 0 else piece.copy() for piece in row] for row in self.board]
+        return board
+
+    """
+
+    encode(self): Method that returns the position as 32 bytes, one per dark 
+    square (see checkers_squares): 0 for an empty square, otherwise the piece 
+    kind of checkers_zobrist plus one. It is the compact form to store and 
+    send positions in; a Board with its Piece objects takes about a hundred 
+    times as much memory.
+
+    decode(cls, data): Class method that builds a Board from encode(). The piece 
+    counters are set from the pieces on the board (the king counters to the 
+    kings on the board) and the hash and evaluation are computed from scratch.
+
+    """
+
+    def encode(self):
+        codes = bytearray(SQUARES)
+        for row in self.board:
+            for piece in row:
+                if piece != 0:
+                    codes[4 * piece.row + piece.col // 2] = piece_kind(piece.color, piece.king) + 1
+        return bytes(codes)
+
+    @classmethod
+    def decode(cls, data):
+        if len(data) != SQUARES:
+            raise ValueError('an encoded position has %d bytes, not %d' % (SQUARES, len(data)))
+        board = cls.__new__(cls)
+        board.board = [[0] * COLS for _ in range(ROWS)]
+        board.red_left = board.white_left = board.red_kings = board.white_kings = 0
+        board.zobrist = board.evaluation = 0
+        board.white_squares = board.yellow_squares = board.king_squares = 0
+        for sq, code in enumerate(data):
+            if not code:
+                continue
+            row, col = row_col(sq)
+            kind = code - 1
+            piece = Piece(row, col, WHITE if kind in (WHITE_MAN, WHITE_KING) else YELLOW)
+            if kind in (WHITE_KING, YELLOW_KING):
+                piece.make_king()
+            board.board[row][col] = piece
+            if piece.color == WHITE:
+                board.white_left += 1
+                board.white_kings += piece.king
+                board.white_squares |= 1 << sq
+            else:
+                board.red_left += 1
+                board.red_kings += piece.king
+                board.yellow_squares |= 1 << sq
+            if piece.king:
+                board.king_squares |= 1 << sq
+            board.zobrist ^= piece_key(piece)
+            board.evaluation += piece_value(piece)
+        return board
+
+    """
+
+    get_all_moves(self, color): Method that returns every move of the given color
+    as ((from_row, from_col), (to_row, to_col), skipped) tuples, in the order
+    minimax.get_all_moves_board generates boards.
+
+    apply_move(self, move): Method that returns a copy of the board with the move played.
+
+    is_promotion(self, move): Method that returns True if the move crowns a piece.
+
+    """
+
+    def get_all_moves(self, color):
+        moves = []
+        for piece in self.get_all_pieces(color):
+            for target, skipped in self.get_valid_moves(piece).items():
+                moves.append(((piece.row, piece.col), target, skipped))
+        return moves
+
+    def apply_move(self, move):
+        board = deepcopy(self)
+        board.move(board.get_piece(*move[0]), *move[1])
+        if move[2]:
+            board.remove(move[2])
+        return board
+
+    """
+
+    make_move(self, move): Method that plays a move from get_all_moves on this board 
+    in place and returns an undo record: the moved piece, its square and king flag 
+    before the move, the captured pieces, the piece counters, the square masks, the hash 
+    and the evaluation.
+
+    unmake_move(self, undo): Method that takes back the move make_move returned undo for. 
+    Moves must be taken back in the reverse order they were made.
+
+    """
+
+    def make_move(self, move):
+        piece = self.board[move[0][0]][move[0][1]]
+        undo = (piece, piece.row, piece.col, piece.king, move[2],
+                self.white_left, self.red_left, self.white_kings, self.red_kings, self.zobrist, self.evaluation,
+                self.white_squares, self.yellow_squares, self.king_squares)
+        self.move(piece, *move[1])
+        if move[2]:
+            self.remove(move[2])
+        return undo
+
+    def unmake_move(self, undo):
+        (piece, row, col, king, skipped, self.white_left, self.red_left, self.white_kings, self.red_kings,
+         self.zobrist, self.evaluation, self.white_squares, self.yellow_squares, self.king_squares) = undo
+        self.board[piece.row][piece.col] = 0
+        self.board[row][col] = piece
+        piece.move(row, col)
+        piece.king = king
+        for captured in skipped:
+            self.board[captured.row][captured.col] = captured
+
+    def is_promotion(self, move):
+        row = move[1][0]
+        return (row == ROWS - 1 or row == 0) and not self.get_piece(*move[0]).king
+
+    """
     
     get_valid_moves(self, piece): Method that returns a 
     dictionary of all valid moves for a given piece object.
+    Men move forward only (up for YELLOW, down for WHITE), kings both ways.
 
 
     """
     
     def get_valid_moves(self, piece):
         moves = {}
-        left = piece.col - 1
-        right = piece.col + 1
-        row = piece.row
+        sq = 4 * piece.row + piece.col // 2
 
         if piece.color == YELLOW or piece.king:
-            moves.update(self._traverse_left(row -1, max(row-3, -1), -1, piece.color, left))
-            moves.update(self._traverse_right(row -1, max(row-3, -1), -1, piece.color, right))
+            self._square_moves(sq, UP_DIRECTIONS, piece.color, moves)
         if piece.color == WHITE or piece.king:
-            moves.update(self._traverse_left(row +1, min(row+3, ROWS), 1, piece.color, left))
-            moves.update(self._traverse_right(row +1, min(row+3, ROWS), 1, piece.color, right))
+            self._square_moves(sq, DOWN_DIRECTIONS, piece.color, moves)
     
         return moves
     
 
     """
     
-    _traverse_left(self, start, stop, step, color, left, skipped=[]), 
-    _traverse_right(self, start, stop, step, color, right, skipped=[]): 
-    Private helper methods used by the get_valid_moves method to traverse 
-    the board in search of valid moves for a given piece object. 
-    These methods return a dictionary of all valid moves for a given piece object in the given direction.
+    _square_moves(self, sq, directions, color, moves), 
+    _continue_jumps(self, sq, directions, color, jumped, moves): 
+    Private helper methods used by the get_valid_moves method to add the 
+    steps and jumps of the piece on square sq in the given directions to moves. 
+    They look the squares up in the NEIGHBOR_RC and JUMP_RC tables of 
+    checkers_squares instead of computing them.
+
+    A jump may go on in the same vertical direction, and every landing square 
+    is a move of its own that lists the last two pieces jumped; a continued 
+    jump moving up can not land on row 0. _continue_jumps follows the jumps 
+    with a stack, depth first and left before right, so the moves come out in 
+    the order of the recursive traversal it replaces, and a square reached 
+    twice keeps the pieces of the last path to it.
 
 
 
     
     """
 
-    def _traverse_left(self, start, stop, step, color, left, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if left < 0:
-                break
-            
-            current = self.board[r][left]
-            if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r, left)] = last + skipped
-                else:
-                    moves[(r, left)] = last
-                
-                if last:
-                    if step == -1:
-                        row = max(r-3, 0)
-                    else:
-                        row = min(r+3, ROWS)
-                    moves.update(self._traverse_left(r+step, row, step, color, left-1,skipped=last))
-                    moves.update(self._traverse_right(r+step, row, step, color, left+1,skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
-
-            left -= 1
-        
-        return moves
-
-    def _traverse_right(self, start, stop, step, color, right, skipped=[]):
-        moves = {}
-        last = []
-        for r in range(start, stop, step):
-            if right >= COLS:
-                break
-            
-            current = self.board[r][right]
+    def _square_moves(self, sq, directions, color, moves):
+        board = self.board
+        for direction in directions:
+            near = NEIGHBOR_RC[direction][sq]
+            if near is None:
+                continue
+            current = board[near[0]][near[1]]
             if current == 0:
-                if skipped and not last:
-                    break
-                elif skipped:
-                    moves[(r,right)] = last + skipped
-                else:
-                    moves[(r, right)] = last
-                
-                if last:
-                    if step == -1:
-                        row = max(r-3, 0)
-                    else:
-                        row = min(r+3, ROWS)
-                    moves.update(self._traverse_left(r+step, row, step, color, right-1,skipped=last))
-                    moves.update(self._traverse_right(r+step, row, step, color, right+1,skipped=last))
-                break
-            elif current.color == color:
-                break
-            else:
-                last = [current]
+                moves[near] = []
+                continue
+            if current.color == color:
+                continue
+            far = JUMP_RC[direction][sq]
+            if far is None or board[far[0]][far[1]] != 0:
+                continue
+            moves[far] = [current]
+            self._continue_jumps(JUMP[direction][sq], directions, color, current, moves)
 
-            right += 1
-        
-        return moves
\ No newline at end of file
+    def _continue_jumps(self, sq, directions, color, jumped, moves):
+        board = self.board
+        up = directions is UP_DIRECTIONS
+        stack = []
+        while True:
+            for direction in directions[::-1]:
+                far = JUMP_RC[direction][sq]
+                if far is None or (up and far[0] == 0) or board[far[0]][far[1]] != 0:
+                    continue
+                current = board[NEIGHBOR_RC[direction][sq][0]][NEIGHBOR_RC[direction][sq][1]]
+                if current != 0 and current.color != color:
+                    stack.append((JUMP[direction][sq], far, current, jumped))
+            if not stack:
+                return
+            sq, far, jumped, previous = stack.pop()
+            moves[far] = [jumped, previous]
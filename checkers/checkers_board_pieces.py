@@ -1,16 +1,19 @@
-from .checkers_constant import YELLOW, WHITE, SQUARE_SIZE, GREY, CROWN_IMAGE
-import pygame
+from .checkers_constant import YELLOW, WHITE, SQUARE_SIZE, GREY
+from .checkers_assets import crown_image
 
 class Piece:
     PADDING = 15
     OUTLINE = 2
 
+    __slots__ = ('row', 'col', 'color', 'king')
+
     """
     
     The __init__ method initializes the attributes of the piece, 
     including its row and column positions, its color, and whether 
-    or not it is a king piece. It also sets the initial x and y 
-    positions of the piece on the board by calling the calc_pos method.
+    or not it is a king piece. A piece only stores these four attributes 
+    (it has __slots__ and no __dict__), as boards copied by the search 
+    hold many of them.
     
     """
 
@@ -19,21 +22,22 @@ class Piece:
         self.col = col
         self.color = color
         self.king = False
-        self.x = 0
-        self.y = 0
-        self.calc_pos()
 
         
         """
         
-        The calc_pos method calculates the x and y pixel positions 
-        of the piece on the board based on its row and column 
-        positions and the size of each square on the board.
+        The x and y properties are the pixel position of the center 
+        of the piece on the window, computed from its row and column 
+        and the size of each square on the board when it is drawn.
 
         """
-    def calc_pos(self):
-        self.x = SQUARE_SIZE * self.col + SQUARE_SIZE // 2
-        self.y = SQUARE_SIZE * self.row + SQUARE_SIZE // 2
+    @property
+    def x(self):
+        return SQUARE_SIZE * self.col + SQUARE_SIZE // 2
+
+    @property
+    def y(self):
+        return SQUARE_SIZE * self.row + SQUARE_SIZE // 2
 
         """
         
@@ -51,28 +55,40 @@ class Piece:
     The draw method takes a Pygame window object as an argument and draws the piece on 
     the board. It first draws a grey circle as the background of the piece, then draws a 
     colored circle on top of it representing the piece. If the piece is a king, it also 
-    draws a crown image on top of the piece.
+    draws a crown image on top of the piece. pygame and the crown image are only loaded
+    the first time a piece is drawn.
 
     """
     
     def draw(self, win):
+        import pygame
         radius = SQUARE_SIZE//2 - self.PADDING
         pygame.draw.circle(win, GREY, (self.x, self.y), radius + self.OUTLINE)
         pygame.draw.circle(win, self.color, (self.x, self.y), radius)
         if self.king:
-            win.blit(CROWN_IMAGE, (self.x - CROWN_IMAGE.get_width()//2, self.y - CROWN_IMAGE.get_height()//2))
+            crown = crown_image()
+            win.blit(crown, (self.x - crown.get_width()//2, self.y - crown.get_height()//2))
 
     """
     
-    The move method updates the row and column positions of the piece and recalculates 
-    its x and y positions on the board by calling the calc_pos method.
+    The move method updates the row and column positions of the piece.
     
     """
 
     def move(self, row, col):
         self.row = row
         self.col = col
-        self.calc_pos()
+
+    """
+    
+    The copy method returns a new piece with the same square, color and king flag.
+
+    """
+
+    def copy(self):
+        piece = self.__class__.__new__(self.__class__)
+        piece.row, piece.col, piece.color, piece.king = self.row, self.col, self.color, self.king
+        return piece
 
     """
     
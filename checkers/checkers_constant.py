@@ -1,5 +1,3 @@
-import pygame
-
 WIDTH, HEIGHT = 600, 600
 ROWS, COLS = 8, 8
 SQUARE_SIZE = WIDTH//COLS
@@ -11,4 +9,9 @@ BLACK = (0, 0, 0)
 BLUE = (0, 0, 255)
 GREY = (128,128,128)
 
-CROWN_IMAGE = pygame.transform.scale(pygame.image.load('assets/crown.jpg'), (44, 25))
\ No newline at end of file
+# The crown image needs pygame; it is loaded on first access (see checkers_assets).
+def __getattr__(name):
+    if name == 'CROWN_IMAGE':
+        from .checkers_assets import crown_image
+        return crown_image()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
\ No newline at end of file
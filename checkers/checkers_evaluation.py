@@ -0,0 +1,195 @@
+import json
+import os
+from .checkers_constant import ROWS, COLS
+from .checkers_squares import SQUARES, ROW_OF, COL_OF, square_of
+from .checkers_zobrist import WHITE_MAN, WHITE_KING, YELLOW_MAN, YELLOW_KING, piece_kind
+
+"""
+
+Positional evaluation terms shared by the engine code. Every term is a sum
+over the pieces on the board of a value that only depends on the kind of
+piece (see checkers_zobrist) and its square, counted positive for WHITE and
+negative for YELLOW, so scores are from WHITE's point of view like
+Board.evaluate:
+
+* material: 1 for every piece.
+* king: 1 for every king (on top of its material).
+* advancement: the number of rows a man has moved towards its crowning row.
+* center: 1 for every piece on the eight central squares.
+* back_rank: 1 for every man still guarding its own back row.
+* edge: 1 for every piece on the left or right edge.
+
+The score of a position is the weighted sum of the terms. Board and
+BitBoard keep it up to date as pieces move, are crowned and are captured,
+so their evaluate() costs O(1). They add up VALUES, the weighted table
+rounded to integer multiples of 1/SCALE of a piece, so the sum does not
+drift however the moves are played and taken back, and evaluate() returns
+it divided by SCALE.
+
+The weights come from WEIGHTS_FILE (evaluation_weights.json next to this
+module), a JSON object {feature: weight}, when it exists, and from
+DEFAULT_WEIGHTS otherwise. Edit the file to tune the evaluation without
+touching the code, or fit it to game results with minimax.checkers_tuning.
+set_weights changes them at run time; boards created before that keep
+scores computed with the old weights, so set the weights before creating
+boards.
+
+Square codes number the contents of a square: EMPTY, then one code per
+piece kind (kind + 1).
+
+"""
+
+FEATURES = ('material', 'king', 'advancement', 'center', 'back_rank', 'edge')
+DEFAULT_WEIGHTS = {'material': 1.0, 'king': 0.5, 'advancement': 0.05, 'center': 0.1, 'back_rank': 0.1,
+                   'edge': -0.05}
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'evaluation_weights.json')
+SCALE = 1000
+
+KINDS = (WHITE_MAN, WHITE_KING, YELLOW_MAN, YELLOW_KING)
+EMPTY = 0
+CODES = 1 + len(KINDS)
+
+CENTER_SQUARES = frozenset(sq for sq in range(SQUARES) if ROW_OF[sq] in (3, 4) and 2 <= COL_OF[sq] <= 5)
+
+
+"""
+
+square_features(kind, sq): Function that returns the value of every term in
+FEATURES for one piece of kind on sq.
+
+"""
+
+def square_features(kind, sq):
+    sign = 1 if kind in (WHITE_MAN, WHITE_KING) else -1
+    king = kind in (WHITE_KING, YELLOW_KING)
+    row = ROW_OF[sq]
+    home = 0 if sign > 0 else ROWS - 1
+    return (sign,
+            sign if king else 0,
+            0 if king else sign * abs(row - home),
+            sign if sq in CENTER_SQUARES else 0,
+            sign if not king and row == home else 0,
+            sign if COL_OF[sq] in (0, COLS - 1) else 0)
+
+
+FEATURE_TABLE = tuple(tuple(square_features(kind, sq) for sq in range(SQUARES)) for kind in KINDS)
+
+
+"""
+
+weight_vector(weights): Function that returns the weights of a
+{feature: weight} dictionary in FEATURES order. Missing features weigh 0,
+unknown ones raise a ValueError.
+
+piece_square_values(weights): Function that returns, for every piece kind
+and square, the weighted sum of its terms: the piece-square table of the
+evaluation.
+
+"""
+
+def weight_vector(weights):
+    unknown = set(weights) - set(FEATURES)
+    if unknown:
+        raise ValueError('unknown evaluation features: %s' % ', '.join(sorted(unknown)))
+    return tuple(float(weights.get(feature, 0.0)) for feature in FEATURES)
+
+
+def piece_square_values(weights=None):
+    if weights is None:
+        weights = WEIGHTS
+    vector = weight_vector(weights)
+    return tuple(tuple(sum(value * weight for value, weight in zip(FEATURE_TABLE[kind][sq], vector))
+                       for sq in range(SQUARES)) for kind in KINDS)
+
+
+"""
+
+byte_tables(values): Function that turns a piece_square_values table into
+byte tables: for every piece kind and every byte of a 32-bit mask, the sum
+of the values of the squares set in each of the 256 possible bytes. A
+position is then scored with 16 lookups whatever the number of pieces.
+
+evaluate_masks(white, yellow, kings, tables): Function that scores a
+position given as BitBoard masks with byte_tables.
+
+"""
+
+def byte_tables(values):
+    return tuple(tuple(tuple(sum(values[kind][8 * byte + bit] for bit in range(8) if pattern >> bit & 1)
+                             for pattern in range(256)) for byte in range(4)) for kind in KINDS)
+
+
+def evaluate_masks(white, yellow, kings, tables):
+    score = 0.0
+    for table, mask in zip(tables, (white & ~kings, white & kings, yellow & ~kings, yellow & kings)):
+        if mask:
+            score += table[0][mask & 255] + table[1][mask >> 8 & 255] + table[2][mask >> 16 & 255] + table[3][mask >> 24]
+    return score
+
+
+
+"""
+
+load_weights(path): Function that reads a {feature: weight} JSON file.
+
+save_weights(weights, path): Function that writes weights as a JSON file
+that load_weights reads back.
+
+set_weights(weights): Function that makes weights the evaluation of the
+boards created from now on: it updates WEIGHTS and VALUES in place.
+
+"""
+
+def load_weights(path=WEIGHTS_FILE):
+    with open(path) as weights_file:
+        weights = json.load(weights_file)
+    weight_vector(weights)
+    return weights
+
+
+def save_weights(weights, path=WEIGHTS_FILE):
+    weight_vector(weights)
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as weights_file:
+        json.dump({feature: weights[feature] for feature in FEATURES if feature in weights},
+                  weights_file, indent=4)
+        weights_file.write('\n')
+    os.replace(temporary, path)
+
+
+def set_weights(weights):
+    WEIGHTS.clear()
+    WEIGHTS.update(weights)
+    for kind, row in zip(KINDS, piece_square_values(weights)):
+        VALUES[kind][:] = [round(value * SCALE) for value in row]
+
+
+"""
+
+piece_value(piece): Function that returns the VALUES entry of a Piece on its
+current square.
+
+masks_value(white, yellow, kings): Function that returns the sum of VALUES
+over a position given as BitBoard masks, for boards that compute their
+score from scratch.
+
+"""
+
+def piece_value(piece):
+    return VALUES[piece_kind(piece.color, piece.king)][square_of(piece.row, piece.col)]
+
+
+def masks_value(white, yellow, kings):
+    value = 0
+    for kind, mask in zip(KINDS, (white & ~kings, white & kings, yellow & ~kings, yellow & kings)):
+        table = VALUES[kind]
+        while mask:
+            bit = mask & -mask
+            value += table[bit.bit_length() - 1]
+            mask ^= bit
+    return value
+
+
+WEIGHTS = {}
+VALUES = [[0] * SQUARES for _ in KINDS]
+set_weights(load_weights() if os.path.exists(WEIGHTS_FILE) else DEFAULT_WEIGHTS)
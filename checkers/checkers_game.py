@@ -1,20 +1,32 @@
-import pygame
-from .checkers_constant import YELLOW, WHITE, BLUE, SQUARE_SIZE
+from .checkers_constant import YELLOW, WHITE
+from .checkers_renderer import BoardRenderer, draw_move_marker
+from .checkers_squares import square_of
 from checkers.checkers_board import Board
 
 
 
 """
 
-update(self): This method updates the game display by 
-calling the draw method of the game board and drawing 
-valid moves on the window, then updates the game window using Pygame.
+update(self): This method updates the game display. A BoardRenderer 
+redraws only the squares whose piece or valid-move marker changed since 
+the last frame, from a cached background, and only those rectangles are 
+passed to pygame.display.update; a frame where nothing changed costs 
+almost nothing.
+
+invalidate(self): This method makes the next update redraw the whole 
+window, for when the window contents were lost or drawn over.
+pygame is only imported by the drawing methods, so a Game without 
+a window (win=None) can be used by headless code.
 
 _init(self): This method initializes the game
- variables such as self.selected, self.board, self.turn, and self.valid_moves.
+ variables such as self.selected, self.board, self.turn, self.valid_moves 
+ and self.history.
+ The board is created with the board_class given to the constructor
+ (Board by default, or BitBoard).
 
 winner(self): This method returns the winner of the game, 
-which is determined by the winner method of the game board.
+which is determined by the winner method of the game board 
+with the side to move, so a player who can not move has lost.
 
 reset(self): This method resets the game by calling the _init method.
 
@@ -39,33 +51,69 @@ get_board(self): This method returns the current game board.
 ai_move(self, board): This method performs a move for 
 the AI player by changing the current game board to the specified board and changing the turn.
 
+apply_move(self, start, end): This method plays the move of the piece on 
+square start to square end, removing the pieces it jumps, and changes the turn.
+
+history: the moves played since the start, recorded by _move and apply_move 
+as BitBoard moves (from_square, to_square, captured_mask), so a game can be 
+saved as PDN (see checkers_pdn.game_record). ai_move only gets the board after 
+the move, so it does not record one.
+
+poll_ai(self): This method drives an AI worker (see minimax.checkers_worker) 
+given to the constructor. It starts a background search of the current position 
+if none is running, and plays the move once the result is ready, returning True 
+in that case. It never blocks, so the render loop keeps running while the AI thinks.
+
+ponder_ai(self): This method lets the AI worker ponder the current position 
+while the player thinks about their move (see AIWorker.ponder). The next 
+poll_ai cancels the pondering and answers at once when the move played was 
+one the worker already searched.
+
+close(self): This method stops the AI worker, if any.
+
+reset also cancels a running AI search.
+
 
 
 """
 
 
 class Game:
-    def __init__(self, win):
+    def __init__(self, win, board_class=Board, ai=None):
+        self.board_class = board_class
+        self.ai = ai
+        self.renderer = BoardRenderer()
         self._init()
         self.win = win
     
     def update(self):
-        self.board.draw(self.win)
-        self.draw_valid_moves(self.valid_moves)
-        pygame.display.update()
+        import pygame
+        rects = self.renderer.draw(self.win, self.board, self.valid_moves)
+        if rects:
+            pygame.display.update(rects)
+
+    def invalidate(self):
+        self.renderer.invalidate()
 
     def _init(self):
         self.selected = None
-        self.board = Board()
+        self.board = self.board_class()
         self.turn = YELLOW
         self.valid_moves = {}
+        self.history = []
 
     def winner(self):
-        return self.board.winner()
+        return self.board.winner(self.turn)
 
     def reset(self):
+        if self.ai is not None:
+            self.ai.cancel()
         self._init()
 
+    def close(self):
+        if self.ai is not None:
+            self.ai.shutdown()
+
     def select(self, row, col):
         if self.selected:
             result = self._move(row, col)
@@ -84,10 +132,12 @@ class Game:
     def _move(self, row, col):
         piece = self.board.get_piece(row, col)
         if self.selected and piece == 0 and (row, col) in self.valid_moves:
+            start = square_of(self.selected.row, self.selected.col)
             self.board.move(self.selected, row, col)
             skipped = self.valid_moves[(row, col)]
             if skipped:
                 self.board.remove(skipped)
+            self._record(start, row, col, skipped)
             self.change_turn()
         else:
             return False
@@ -97,7 +147,7 @@ class Game:
     def draw_valid_moves(self, moves):
         for move in moves:
             row, col = move
-            pygame.draw.circle(self.win, BLUE, (col * SQUARE_SIZE + SQUARE_SIZE//2, row * SQUARE_SIZE + SQUARE_SIZE//2), 15)
+            draw_move_marker(self.win, row, col)
 
     def change_turn(self):
         self.valid_moves = {}
@@ -111,4 +161,34 @@ class Game:
     
     def ai_move(self, board):
         self.board = board
-        self.change_turn()
\ No newline at end of file
+        self.change_turn()
+
+    def apply_move(self, start, end):
+        piece = self.board.get_piece(*start)
+        skipped = self.board.get_valid_moves(piece)[end]
+        self.board.move(piece, *end)
+        if skipped:
+            self.board.remove(skipped)
+        self._record(square_of(*start), end[0], end[1], skipped)
+        self.change_turn()
+
+    def _record(self, start, row, col, skipped):
+        captured = 0
+        for piece in skipped:
+            captured |= 1 << square_of(piece.row, piece.col)
+        self.history.append((start, square_of(row, col), captured))
+
+    def poll_ai(self):
+        if not self.ai.pending():
+            self.ai.start(self.board, self.turn == WHITE)
+            return False
+
+        result = self.ai.poll()
+        if result is None or result[1] is None:
+            return False
+
+        self.apply_move(*result[1])
+        return True
+
+    def ponder_ai(self):
+        self.ai.ponder(self.board, self.turn == WHITE)
\ No newline at end of file
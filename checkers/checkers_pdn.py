@@ -0,0 +1,337 @@
+import re
+from .checkers_bitboard import BitBoard
+from .checkers_constant import YELLOW, WHITE
+from .checkers_squares import SQUARES, iter_bits, row_col
+
+
+"""
+Reading and writing games in PDN (Portable Draughts Notation), the text
+format draughts programs and game archives use:
+
+    [Event "Club match"]
+    [White "Ann"]
+    [Black "Bob"]
+    [Result "1-0"]
+
+    1. 11-15 23-19 2. 8-11 22-17 {a comment} 3. 17x10 ... 1-0
+
+PDN numbers the dark squares 1 to 32 from the side of Black, who moves
+first. Here YELLOW moves first, so YELLOW plays Black, and PDN square n is
+dark square 32 - n of checkers_squares: Black's (YELLOW's) men start on
+1-12 and WHITE's on 21-32. Results are from White's side: "1-0" is a WHITE
+win, "0-1" a YELLOW win.
+
+Moves are written from-to, with an x instead of the dash for captures. A
+capture that jumps several times may list its landing squares (11x18x25);
+only the first and the last square are used to find it among the legal
+moves. A FEN tag gives a starting position other than the standard one:
+
+    [FEN "B:W21,22,K30:B1,5,K10"]
+
+read_games reads a file one game at a time, so an archive of any size is
+streamed with flat memory. Comments ({...} and ; to the end of the line)
+are kept, variations ((...)) and numeric annotations ($n) are skipped.
+
+"""
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+TAG_ORDER = ('Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result')
+LINE_WIDTH = 79
+
+_TAG = re.compile(r'\[\s*(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+_TOKEN = re.compile(r'\{[^}]*\}?|;.*|[()]|(?:1/2-1/2|1-0|0-1|2-0|0-2|1-1)(?!\d)|\*|\d+\.+|\d+(?:[-x:]\d+)+[!?]*'
+                    r'|\$\d+|[!?]+|\S+')
+_PDN_RESULTS = {'2-0': '1-0', '0-2': '0-1', '1-1': '1/2-1/2'}
+
+
+"""
+
+square_number(sq), number_square(number): Functions that convert a dark
+square (0..31) to its PDN number (1..32) and back.
+
+move_text(move): Function that writes a BitBoard move in PDN.
+
+parse_move(board, color, text): Function that returns the BitBoard move of
+color on board a PDN move stands for. It raises a ValueError if the move is
+not legal.
+
+"""
+
+def square_number(sq):
+    return SQUARES - sq
+
+
+def number_square(number):
+    if not 1 <= number <= SQUARES:
+        raise ValueError('PDN squares are numbered 1 to %d, not %d' % (SQUARES, number))
+    return SQUARES - number
+
+
+def move_text(move):
+    return '%d%s%d' % (square_number(move[0]), 'x' if move[2] else '-', square_number(move[1]))
+
+
+def parse_move(board, color, text):
+    squares = re.split(r'[-x:]', text.rstrip('!?'))
+    try:
+        start, end = number_square(int(squares[0])), number_square(int(squares[-1]))
+    except ValueError:
+        raise ValueError('%r is not a PDN move' % text)
+    for move in board.get_all_moves(color):
+        if move[0] == start and move[1] == end:
+            return move
+    raise ValueError('%s is not a legal move for %s' % (text, 'White' if color == WHITE else 'Black'))
+
+
+"""
+
+parse_fen(text): Function that returns the (BitBoard, color to move) of a
+PDN FEN string. The king counters are set to the kings on the board.
+
+fen_of(board, color): Function that writes a position as a FEN string.
+
+"""
+
+def parse_fen(text):
+    fields = text.strip().rstrip('.').split(':')
+    if not fields or fields[0].upper() not in ('B', 'W'):
+        raise ValueError('%r is not a FEN position' % text)
+    masks = {'W': [0, 0], 'B': [0, 0]}
+    for field in fields[1:]:
+        side, pieces = field[:1].upper(), field[1:]
+        if side not in masks:
+            raise ValueError('%r is not a FEN position' % text)
+        for piece in filter(None, (piece.strip() for piece in pieces.split(','))):
+            king = piece[0].upper() == 'K'
+            first, _, last = piece.lstrip('Kk').partition('-')
+            for number in range(int(first), int(last or first) + 1):
+                masks[side][king] |= 1 << number_square(number)
+
+    (white_men, white_kings), (yellow_men, yellow_kings) = masks['W'], masks['B']
+    white, yellow = white_men | white_kings, yellow_men | yellow_kings
+    if white & yellow:
+        raise ValueError('%r puts two pieces on one square' % text)
+    kings = white_kings | yellow_kings
+    board = BitBoard.unpack((white, yellow, kings, bin(white).count('1'), bin(yellow).count('1'),
+                             bin(white_kings).count('1'), bin(yellow_kings).count('1')))
+    return board, (YELLOW if fields[0].upper() == 'B' else WHITE)
+
+
+def fen_of(board, color):
+    fields = ['B' if color == YELLOW else 'W']
+    for side, mask in (('W', board.white), ('B', board.yellow)):
+        numbers = sorted(square_number(sq) for sq in iter_bits(mask))
+        fields.append(side + ','.join(('K%d' if board.kings >> number_square(number) & 1 else '%d') % number
+                                      for number in numbers))
+    return ':'.join(fields)
+
+
+class PDNGame:
+    def __init__(self, tags=None, moves=None, result='*'):
+        self.tags = dict(tags or {})
+        self.moves = list(moves or [])
+        self.result = result
+        self.comments = {}
+
+    """
+
+    tags: the {name: value} tag pairs. moves: the moves as PDN text, with
+    their '!'/'?' marks. result: one of RESULTS. comments: {ply: text}, the
+    comment written after the first ply moves (0 for a comment before the
+    first move).
+
+    start(self): Method that returns the (BitBoard, color to move) the game
+    starts from: its FEN tag, or the standard start with YELLOW to move.
+
+    replay(self): Generator method that plays the moves and yields
+    (board, color, move) before each of them, board being the position the
+    move is played from. The same board object is played on, so copy it to
+    keep a position. It raises a ValueError at the first illegal move.
+
+    """
+
+    def start(self):
+        if 'FEN' in self.tags:
+            return parse_fen(self.tags['FEN'])
+        return BitBoard(), YELLOW
+
+    def replay(self):
+        board, color = self.start()
+        for ply, text in enumerate(self.moves):
+            try:
+                move = parse_move(board, color, text)
+            except ValueError as error:
+                raise ValueError('move %d: %s' % (ply + 1, error))
+            yield board, color, move
+            board.make_move(move)
+            color = WHITE if color == YELLOW else YELLOW
+
+    def __repr__(self):
+        return 'PDNGame(%r, %d moves, %r)' % (self.tags, len(self.moves), self.result)
+
+
+"""
+
+record(moves, tags, result, board, color): Function that builds a PDNGame
+from BitBoard moves played from board (the standard start by default).
+
+"""
+
+def record(moves, tags=None, result='*', board=None, color=YELLOW):
+    game = PDNGame(tags, [move_text(move) for move in moves], result)
+    if board is not None and (board.white, board.yellow, board.kings, color) != \
+            (BitBoard.START_WHITE, BitBoard.START_YELLOW, 0, YELLOW):
+        game.tags['FEN'] = fen_of(board, color)
+    game.tags['Result'] = result
+    return game
+
+
+"""
+
+game_record(game, tags): Function that returns the PDNGame of a Game from
+its history, with the Game's winner as result, if there is one.
+
+load_game(game, pdn_game): Function that resets a Game and plays the moves
+of a PDNGame on it, so a saved game can be carried on or replayed. Games
+with a FEN tag raise a ValueError.
+
+"""
+
+def game_record(game, tags=None):
+    result = {WHITE: '1-0', YELLOW: '0-1'}.get(game.winner(), '*')
+    return record(game.history, tags, result)
+
+
+def load_game(game, pdn_game):
+    if 'FEN' in pdn_game.tags:
+        raise ValueError('a Game can only replay games from the start position')
+    game.reset()
+    for _, _, move in pdn_game.replay():
+        game.apply_move(row_col(move[0]), row_col(move[1]))
+
+
+"""
+
+read_games(lines): Generator that parses PDN text given as an iterable of
+lines, such as an open file, and yields one PDNGame at a time. A game ends
+at its result or where the tags of the next game start.
+
+"""
+
+def read_games(lines):
+    game = PDNGame()
+    comment, variations, moved = None, 0, False
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if comment is not None:
+            end = line.find('}')
+            if end < 0:
+                comment.append(line)
+                continue
+            comment.append(line[:end])
+            if not variations:
+                _add_comment(game, ' '.join(comment))
+            comment, line = None, line[end + 1:]
+        elif line.startswith('%'):
+            continue
+
+        stripped = line.strip()
+        if stripped.startswith('[') and not variations:
+            if moved:
+                yield game
+                game, moved = PDNGame(), False
+            for name, value in _TAG.findall(stripped):
+                game.tags[name] = value.replace('\\"', '"').replace('\\\\', '\\')
+            continue
+
+        for token in _TOKEN.findall(line):
+            if token.startswith('{'):
+                if not token.endswith('}'):
+                    comment = [token[1:]]
+                elif not variations:
+                    _add_comment(game, token[1:-1])
+            elif token.startswith(';'):
+                if not variations:
+                    _add_comment(game, token[1:])
+            elif token == '(':
+                variations += 1
+            elif token == ')':
+                variations = max(variations - 1, 0)
+            elif variations or token[0] in '$!?' or token[-1] == '.':
+                continue
+            elif token in RESULTS or token in _PDN_RESULTS:
+                game.result = _PDN_RESULTS.get(token, token)
+                game.tags.setdefault('Result', game.result)
+                yield game
+                game, moved, variations = PDNGame(), False, 0
+            elif token[0].isdigit():
+                game.moves.append(token)
+                moved = True
+            else:
+                raise ValueError('unexpected %r in PDN movetext' % token)
+
+    if moved or game.tags:
+        game.result = game.tags.get('Result', game.result)
+        yield game
+
+
+def _add_comment(game, text):
+    text = text.strip()
+    if text:
+        ply = len(game.moves)
+        game.comments[ply] = game.comments[ply] + ' ' + text if ply in game.comments else text
+
+
+"""
+
+format_game(game): Function that returns the PDN text of a game: its tags,
+the standard ones first, and its moves with their numbers and comments,
+wrapped at LINE_WIDTH columns.
+
+write_game(file, game): Function that writes a game to a file, followed by
+an empty line.
+
+"""
+
+def format_game(game):
+    tags = dict(game.tags)
+    tags['Result'] = game.result
+    names = [name for name in TAG_ORDER if name in tags] + [name for name in tags if name not in TAG_ORDER]
+    lines = ['[%s "%s"]' % (name, str(tags[name]).replace('\\', '\\\\').replace('"', '\\"')) for name in names]
+    lines.append('')
+
+    _, color = game.start()
+    tokens = _comment_tokens(game.comments[0]) if 0 in game.comments else []
+    number = 1
+    for ply, text in enumerate(game.moves):
+        if color == YELLOW:
+            tokens.append('%d.' % number)
+        elif ply == 0:
+            tokens.append('%d...' % number)
+        tokens.append(text)
+        if ply + 1 in game.comments:
+            tokens.extend(_comment_tokens(game.comments[ply + 1]))
+        if color == WHITE:
+            number += 1
+        color = WHITE if color == YELLOW else YELLOW
+    tokens.append(game.result)
+
+    line = ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = line + ' ' + token if line else token
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def _comment_tokens(text):
+    words = text.replace('}', ')').split() or ['']
+    words[0], words[-1] = '{' + words[0], words[-1] + '}'
+    return words
+
+
+def write_game(file, game):
+    file.write(format_game(game) + '\n')
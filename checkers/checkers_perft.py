@@ -0,0 +1,217 @@
+import argparse
+import time
+from .checkers_bitboard import BitBoard
+from .checkers_board import Board
+from .checkers_constant import ROWS, COLS, YELLOW, WHITE
+from .checkers_squares import SQUARES, square_of, row_col, iter_bits
+from .checkers_zobrist import piece_kind
+
+
+"""
+Perft (performance test) for the move generators. perft counts the leaf
+nodes of the full move tree to a fixed depth. The count only depends on the
+rules, so it checks a move generator against known numbers, and the time it
+takes measures how fast the generator is.
+
+Any board class with get_all_moves, make_move and unmake_move can be
+counted. compare walks the trees of two board classes side by side and
+reports the first position where their move sets differ, so a new backend
+can be checked against Board move by move, not only by its totals.
+
+Positions are either the start position or an 8-line diagram, one character
+per square from row 0 down to row 7: 'w'/'W' for a WHITE man/king,
+'y'/'Y' for a YELLOW man/king, anything else for an empty square.
+
+    python -m checkers.checkers_perft --depth 6
+    python -m checkers.checkers_perft --depth 5 --backend board --compare bitboard
+    python -m checkers.checkers_perft --depth 4 --position diagram.txt --color white --divide
+
+"""
+
+BACKENDS = {'board': Board, 'bitboard': BitBoard}
+
+# Leaf counts from the start position with YELLOW to move, as generated by
+# Board. They follow this game's rules (no forced captures, see
+# checkers_bitboard), so they differ from the published perft numbers.
+REFERENCE_COUNTS = {1: 7, 2: 49, 3: 379, 4: 2872, 5: 23582, 6: 190647, 7: 1607254, 8: 13411609}
+
+
+"""
+
+parse_position(text, board_class): Function that builds a board of
+board_class from a diagram, through Board.decode: the piece counters are
+set from the pieces on the board and the hash and evaluation are computed
+from scratch.
+
+"""
+
+def parse_position(text, board_class=Board):
+    rows = [line.strip() for line in text.strip().splitlines()]
+    if len(rows) != ROWS or any(len(row) != COLS for row in rows):
+        raise ValueError('a position has %d rows of %d squares' % (ROWS, COLS))
+
+    codes = bytearray(SQUARES)
+    for row, line in enumerate(rows):
+        for col, char in enumerate(line):
+            if char not in 'wWyY':
+                continue
+            if (row + col) % 2 == 0:
+                raise ValueError('piece on a light square at row %d, col %d' % (row, col))
+            codes[square_of(row, col)] = piece_kind(WHITE if char in 'wW' else YELLOW, char.isupper()) + 1
+    board = Board.decode(bytes(codes))
+    return board if board_class is Board else board_class.from_board(board)
+
+
+"""
+
+perft(board, color, depth): Function that returns the number of leaf nodes
+depth plies below board with color to move. Moves are played in place and
+taken back, so board is left as it was.
+
+divide(board, color, depth): Function that returns the perft count below
+each move of color, as a dictionary keyed by move_key.
+
+"""
+
+def perft(board, color, depth):
+    if depth == 0:
+        return 1
+    moves = board.get_all_moves(color)
+    if depth == 1:
+        return len(moves)
+
+    other = WHITE if color == YELLOW else YELLOW
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        nodes += perft(board, other, depth - 1)
+        board.unmake_move(undo)
+    return nodes
+
+
+def divide(board, color, depth):
+    other = WHITE if color == YELLOW else YELLOW
+    counts = {}
+    for move in board.get_all_moves(color):
+        undo = board.make_move(move)
+        counts[move_key(move)] = perft(board, other, depth - 1)
+        board.unmake_move(undo)
+    return counts
+
+
+"""
+
+move_key(move): Function that returns a move of any board class as
+((from_row, from_col), (to_row, to_col), captured), captured being the
+sorted tuple of the (row, col) squares of the captured pieces.
+
+"""
+
+def move_key(move):
+    start, end, captured = move
+    if isinstance(start, int):
+        return row_col(start), row_col(end), tuple(sorted(row_col(sq) for sq in iter_bits(captured)))
+    return start, end, tuple(sorted((piece.row, piece.col) for piece in captured))
+
+
+"""
+
+compare(reference, candidate, color, depth): Function that walks the move
+trees of two boards holding the same position to depth and checks that
+every position has the same moves, in the same order, with the same
+captures. It returns None when they agree, or (path, expected, actual):
+the moves leading to the first position that differs and the move lists
+of reference and candidate there.
+
+"""
+
+def compare(reference, candidate, color, depth, path=()):
+    expected = [move_key(move) for move in reference.get_all_moves(color)]
+    actual = [move_key(move) for move in candidate.get_all_moves(color)]
+    if expected != actual:
+        return path, expected, actual
+    if depth <= 1:
+        return None
+
+    other = WHITE if color == YELLOW else YELLOW
+    for reference_move, candidate_move, key in zip(reference.get_all_moves(color),
+                                                    candidate.get_all_moves(color), expected):
+        reference_undo = reference.make_move(reference_move)
+        candidate_undo = candidate.make_move(candidate_move)
+        mismatch = compare(reference, candidate, other, depth - 1, path + (key[:2],))
+        candidate.unmake_move(candidate_undo)
+        reference.unmake_move(reference_undo)
+        if mismatch is not None:
+            return mismatch
+    return None
+
+
+"""
+
+run(board, color, depth): Function that runs perft for every depth from 1 to
+depth and returns a list of (depth, nodes, seconds) rows.
+
+"""
+
+def run(board, color, depth):
+    rows = []
+    for current in range(1, depth + 1):
+        start = time.perf_counter()
+        nodes = perft(board, color, current)
+        rows.append((current, nodes, time.perf_counter() - start))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count and time the move tree of a position.')
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='bitboard')
+    parser.add_argument('--position', help='file holding a position diagram (default: start position)')
+    parser.add_argument('--color', choices=('yellow', 'white'), default='yellow', help='side to move')
+    parser.add_argument('--divide', action='store_true', help='print the count below each move')
+    parser.add_argument('--compare', choices=sorted(BACKENDS), help='check the move sets against another backend')
+    args = parser.parse_args()
+
+    board_class = BACKENDS[args.backend]
+    color = WHITE if args.color == 'white' else YELLOW
+    if args.position:
+        with open(args.position) as position_file:
+            text = position_file.read()
+        board = parse_position(text, board_class)
+    else:
+        text = None
+        board = board_class()
+
+    failed = False
+    print('depth  %12s  %9s  %12s' % ('nodes', 'seconds', 'nodes/s'))
+    for depth, nodes, seconds in run(board, color, args.depth):
+        line = '%5d  %12d  %9.3f  %12.0f' % (depth, nodes, seconds, nodes / seconds if seconds else 0)
+        if text is None and color == YELLOW and depth in REFERENCE_COUNTS:
+            ok = REFERENCE_COUNTS[depth] == nodes
+            failed = failed or not ok
+            line += '  ok' if ok else '  expected %d' % REFERENCE_COUNTS[depth]
+        print(line)
+
+    if args.divide:
+        for key, nodes in sorted(divide(board, color, args.depth).items()):
+            print('%s-%s  %d' % (key[0], key[1], nodes))
+
+    if args.compare:
+        other_class = BACKENDS[args.compare]
+        other = parse_position(text, other_class) if text is not None else other_class()
+        mismatch = compare(board, other, color, args.depth)
+        if mismatch is None:
+            print('%s and %s agree to depth %d' % (args.backend, args.compare, args.depth))
+        else:
+            failed = True
+            path, expected, actual = mismatch
+            print('%s and %s differ after %s' % (args.backend, args.compare, list(path)))
+            print('  %s: %s' % (args.backend, expected))
+            print('  %s: %s' % (args.compare, actual))
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
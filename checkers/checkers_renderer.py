@@ -0,0 +1,86 @@
+from .checkers_constant import ROWS, COLS, SQUARE_SIZE, BLUE
+from .checkers_assets import board_background
+
+"""
+
+BoardRenderer draws a board and the valid-move markers to the window one
+frame after another, redrawing only the squares that changed since the
+previous frame.
+
+Every frame it takes a snapshot of every dark square (the color and king
+flag of its piece, and whether it holds a move marker) and compares it with
+the snapshot of the frame before. Each changed square is redrawn from the
+cached background (see checkers_assets), with its piece and marker on top,
+and only the rectangles of those squares are returned for
+pygame.display.update. A frame where nothing changed draws nothing and
+returns an empty list.
+
+The first frame, and the first frame after invalidate(), redraws the whole
+window. Call invalidate() whenever something else has drawn to the window
+or the window contents were lost.
+
+draw_move_marker(win, row, col): Function that draws the marker of a valid
+move on a square.
+
+"""
+
+MOVE_MARKER_RADIUS = 15
+
+
+def draw_move_marker(win, row, col):
+    import pygame
+    pygame.draw.circle(win, BLUE, (col * SQUARE_SIZE + SQUARE_SIZE//2, row * SQUARE_SIZE + SQUARE_SIZE//2),
+                       MOVE_MARKER_RADIUS)
+
+
+class BoardRenderer:
+    def __init__(self):
+        self._squares = None
+
+    """
+
+    draw(self, win, board, moves): Method that brings the window up to date
+    with board and the valid-move squares in moves, and returns the list of
+    rectangles it drew to.
+
+    invalidate(self): Method that makes the next draw redraw everything.
+
+    """
+
+    def draw(self, win, board, moves=()):
+        import pygame
+        squares = _snapshot(board, moves)
+        if self._squares is None:
+            win.blit(board_background(), (0, 0))
+            changed = [square for square, state in squares.items() if state != (None, False)]
+            rects = [win.get_rect()]
+        else:
+            changed = [square for square, state in squares.items() if state != self._squares[square]]
+            rects = []
+
+        background = board_background()
+        for row, col in changed:
+            rect = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
+            win.blit(background, rect, rect)
+            piece = board.get_piece(row, col)
+            if piece != 0:
+                piece.draw(win)
+            if squares[(row, col)][1]:
+                draw_move_marker(win, row, col)
+            if self._squares is not None:
+                rects.append(rect)
+
+        self._squares = squares
+        return rects
+
+    def invalidate(self):
+        self._squares = None
+
+
+def _snapshot(board, moves):
+    squares = {}
+    for row in range(ROWS):
+        for col in range((row + 1) % 2, COLS, 2):
+            piece = board.get_piece(row, col)
+            squares[(row, col)] = ((piece.color, piece.king) if piece != 0 else None, (row, col) in moves)
+    return squares
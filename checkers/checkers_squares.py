@@ -0,0 +1,164 @@
+from .checkers_constant import ROWS, COLS
+
+"""
+
+Square indexing shared by the engine code. Only the 32 dark squares of the
+board can hold a piece, so they are numbered 0..31 in row-major order
+(square = 4 * row + col // 2). Bit n of a 32-bit mask stands for square n.
+
+Directions follow the naming used by Board.get_valid_moves:
+"up" is towards row 0 (the way YELLOW men move), "down" is towards row 7
+(the way WHITE men move), "left" is towards column 0.
+
+"""
+
+SQUARES = 32
+FULL_MASK = (1 << SQUARES) - 1
+
+UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT = 0, 1, 2, 3
+DIRECTIONS = (UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT)
+UP_DIRECTIONS = (UP_LEFT, UP_RIGHT)
+DOWN_DIRECTIONS = (DOWN_LEFT, DOWN_RIGHT)
+DIRECTION_DELTAS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+ROW_OF = tuple(sq // 4 for sq in range(SQUARES))
+COL_OF = tuple(2 * (sq % 4) + (1 - (sq // 4) % 2) for sq in range(SQUARES))
+
+
+"""
+
+square_of(row, col): Returns the dark-square index of (row, col), or -1 for
+a light square or a position outside the board.
+
+row_col(sq): Returns the (row, col) pair of a dark-square index.
+
+"""
+
+def square_of(row, col):
+    if 0 <= row < ROWS and 0 <= col < COLS and (row + col) % 2 == 1:
+        return 4 * row + col // 2
+    return -1
+
+
+def row_col(sq):
+    return ROW_OF[sq], COL_OF[sq]
+
+
+def _build_neighbors():
+    table = []
+    for d_row, d_col in DIRECTION_DELTAS:
+        table.append(tuple(square_of(ROW_OF[sq] + d_row, COL_OF[sq] + d_col) for sq in range(SQUARES)))
+    return tuple(table)
+
+
+"""
+
+NEIGHBOR[direction][sq] is the adjacent dark square in that direction and
+JUMP[direction][sq] the square two steps away (the landing square of a
+jump), both -1 when they fall off the board.
+
+"""
+
+NEIGHBOR = _build_neighbors()
+JUMP = tuple(tuple(NEIGHBOR[d][n] if n >= 0 else -1 for n in NEIGHBOR[d]) for d in DIRECTIONS)
+
+
+"""
+
+NEIGHBOR_RC[direction][sq] and JUMP_RC[direction][sq] are the same squares
+as (row, col) pairs, or None off the board, for boards stored as rows of
+cells like Board.
+
+"""
+
+NEIGHBOR_RC = tuple(tuple(row_col(n) if n >= 0 else None for n in NEIGHBOR[d]) for d in DIRECTIONS)
+JUMP_RC = tuple(tuple(row_col(n) if n >= 0 else None for n in JUMP[d]) for d in DIRECTIONS)
+
+
+def _mask(squares):
+    mask = 0
+    for sq in squares:
+        mask |= 1 << sq
+    return mask
+
+
+EVEN_ROWS = _mask(sq for sq in range(SQUARES) if ROW_OF[sq] % 2 == 0)
+ODD_ROWS = FULL_MASK ^ EVEN_ROWS
+LEFT_EDGE = _mask(sq for sq in range(SQUARES) if COL_OF[sq] == 0)
+RIGHT_EDGE = _mask(sq for sq in range(SQUARES) if COL_OF[sq] == COLS - 1)
+TOP_ROW = _mask(sq for sq in range(SQUARES) if ROW_OF[sq] == 0)
+BOTTOM_ROW = _mask(sq for sq in range(SQUARES) if ROW_OF[sq] == ROWS - 1)
+
+
+"""
+
+shift(mask, direction): Moves every square of the mask one step in the given
+direction with two shifts, one for the even rows and one for the odd rows.
+Squares that would leave the board are dropped.
+
+"""
+
+def shift(mask, direction):
+    if direction == UP_LEFT:
+        return ((mask & EVEN_ROWS) >> 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) >> 5)
+    if direction == UP_RIGHT:
+        return ((mask & EVEN_ROWS & ~RIGHT_EDGE) >> 3) | ((mask & ODD_ROWS) >> 4)
+    if direction == DOWN_LEFT:
+        return (((mask & EVEN_ROWS) << 4) | ((mask & ODD_ROWS & ~LEFT_EDGE) << 3)) & FULL_MASK
+    return (((mask & EVEN_ROWS & ~RIGHT_EDGE) << 5) | ((mask & ODD_ROWS) << 4)) & FULL_MASK
+
+
+OPPOSITE = (DOWN_RIGHT, DOWN_LEFT, UP_RIGHT, UP_LEFT)
+
+
+"""
+
+iter_bits(mask): Yields the square indices set in a mask in increasing
+order, which is the same row-major order Board.get_all_pieces uses.
+
+"""
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+
+"""
+
+mask_cells(mask): Returns the (row, col) pairs of the squares set in a mask,
+in increasing order, from BYTE_CELLS: for each byte of a mask and each of
+its 256 values, the cells of the squares it holds.
+
+"""
+
+BYTE_CELLS = tuple(tuple(tuple(row_col(8 * byte + bit) for bit in range(8) if pattern >> bit & 1)
+                         for pattern in range(256)) for byte in range(4))
+
+
+def mask_cells(mask):
+    return (BYTE_CELLS[0][mask & 255] + BYTE_CELLS[1][mask >> 8 & 255] + BYTE_CELLS[2][mask >> 16 & 255]
+            + BYTE_CELLS[3][mask >> 24])
+
+
+"""
+
+can_move(up_movers, down_movers, opponent, empty): Returns True if any piece
+in up_movers can step or jump up, or any piece in down_movers down, with
+the opponent's pieces and the empty squares given as masks. It looks at all
+the pieces at once with a few shifts per direction, whatever their number.
+
+"""
+
+def can_move(up_movers, down_movers, opponent, empty):
+    for directions, movers in ((UP_DIRECTIONS, up_movers), (DOWN_DIRECTIONS, down_movers)):
+        if not movers:
+            continue
+        for direction in directions:
+            back = OPPOSITE[direction]
+            targets = shift(empty, back)
+            if movers & (targets | shift(opponent & targets, back)):
+                return True
+    return False
@@ -0,0 +1,47 @@
+import random
+from .checkers_constant import WHITE
+from .checkers_squares import SQUARES, square_of
+
+"""
+
+Zobrist keys for hashing positions. Every (piece kind, dark square) pair has
+a random 64-bit key and the hash of a position is the XOR of the keys of its
+pieces, so boards can update it in O(1) when a piece moves, is crowned or is
+captured. SIDE_KEY is XORed in when YELLOW is to move.
+
+The keys come from a fixed seed so that a position hashes to the same value
+in every process and every run; hashes can be stored on disk.
+
+"""
+
+WHITE_MAN, WHITE_KING, YELLOW_MAN, YELLOW_KING = 0, 1, 2, 3
+
+_rng = random.Random(0x636865636B657273)
+PIECE_KEYS = tuple(tuple(_rng.getrandbits(64) for _ in range(SQUARES)) for _ in range(4))
+SIDE_KEY = _rng.getrandbits(64)
+
+
+"""
+
+piece_kind(color, king): Returns the index into PIECE_KEYS for a piece.
+
+piece_key(piece): Returns the Zobrist key of a Piece on its current square.
+
+position_key(board, color): Returns the hash of board with color to move.
+
+"""
+
+def piece_kind(color, king):
+    if color == WHITE:
+        return WHITE_KING if king else WHITE_MAN
+    return YELLOW_KING if king else YELLOW_MAN
+
+
+def piece_key(piece):
+    return PIECE_KEYS[piece_kind(piece.color, piece.king)][square_of(piece.row, piece.col)]
+
+
+def position_key(board, color):
+    if color == WHITE:
+        return board.zobrist
+    return board.zobrist ^ SIDE_KEY
@@ -1,8 +1,7 @@
 from copy import deepcopy
-import pygame
-
-YELLOW = (255,0,0)
-WHITE = (255, 255, 255)
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_bitboard import BitBoard
+from .checkers_stats import unwrap
 
 
 """
@@ -26,21 +25,57 @@ The function recursively explores the search tree, evaluating each possible
 move and selecting the one that maximizes the score for the max player, and 
 minimizes the score for the min player.
 
+The search plays the moves in place on the position (make_move/unmake_move) 
+and only builds a new board for the best move it returns.
+
+A SearchStats (see checkers_stats) can be passed as stats to fill it in 
+with the nodes per depth, leaf evaluations and time per phase of the search.
+
 The evaluation function used in this implementation is defined in the "evaluate" 
 method of the "position" object, which should return a score for the current game state. 
 The higher the score, the better the position is for the max player, and the worse it is for the min player.
 
 """
 
-def minimax_algorithm(position, depth, max_player, game):
+def minimax_algorithm(position, depth, max_player, game, stats=None):
+    if stats is not None:
+        stats.begin()
+        try:
+            evaluation, board = minimax_algorithm(stats.wrap(position), depth, max_player, game)
+        finally:
+            stats.end()
+        return evaluation, unwrap(board)
+
     if depth == 0 or position.winner() != None:
         return position.evaluate(), position
-    
+
+    evaluation, best_move = _minimax_move(position, depth, max_player)
+    if best_move is None:
+        return evaluation, None
+
+    return evaluation, position.apply_move(best_move)
+
+
+"""
+
+_minimax_move(position, depth, max_player): Private helper that runs the 
+minimax recursion in place on position, playing each move with make_move and 
+taking it back with unmake_move instead of copying the board for every child. 
+It returns the score and the best move; position is left unchanged.
+
+"""
+
+def _minimax_move(position, depth, max_player):
     if max_player:
         maxEval = float('-inf')
         best_move = None
-        for move in get_all_moves_board(position, WHITE, game):
-            evaluation = minimax_algorithm(move, depth-1, False, game)[0]
+        for move in position.get_all_moves(WHITE):
+            undo = position.make_move(move)
+            if depth == 1 or position.winner() != None:
+                evaluation = position.evaluate()
+            else:
+                evaluation = _minimax_move(position, depth-1, False)[0]
+            position.unmake_move(undo)
             maxEval = max(maxEval, evaluation)
             if maxEval == evaluation:
                 best_move = move
@@ -49,8 +84,13 @@ def minimax_algorithm(position, depth, max_player, game):
     else:
         minEval = float('inf')
         best_move = None
-        for move in get_all_moves_board(position, YELLOW, game):
-            evaluation = minimax_algorithm(move, depth-1, True, game)[0]
+        for move in position.get_all_moves(YELLOW):
+            undo = position.make_move(move)
+            if depth == 1 or position.winner() != None:
+                evaluation = position.evaluate()
+            else:
+                evaluation = _minimax_move(position, depth-1, True)[0]
+            position.unmake_move(undo)
             minEval = min(minEval, evaluation)
             if minEval == evaluation:
                 best_move = move
@@ -101,10 +141,15 @@ the function creates a copy of the board using the "deepcopy" function,
 simulates the move using the "simulate_move_checkers" function, and adds the 
 resulting board state to a list of all possible moves.
 
+A BitBoard generates the same boards, in the same order, natively.
+
 """
 
 
 def get_all_moves_board(board, color, game):
+    if isinstance(board, BitBoard):
+        return board.successors(color)
+
     moves = []
 
     for piece in board.get_all_pieces(color):
@@ -139,13 +184,16 @@ The function then calls the "draw_valid_moves" method of the "game" object,
 which takes a list of valid move coordinates as an argument and 
 draws a red circle around each valid move location on the game board.
 
-Finally, the function calls "pygame.display.update()" to update the Pygame window with the changes made to the game board.
+Finally, the function calls "pygame.display.update()" to update the Pygame window with the changes made to the game board,
+and tells the game its window has been drawn over, so the next Game.update redraws all of it.
 
 """
 
 def draw_moves_checkers(game, board, piece):
+    import pygame
     valid_moves = board.get_valid_moves(piece)
     board.draw(game.win)
     pygame.draw.circle(game.win, (0,255,0), (piece.x, piece.y), 50, 5)
     game.draw_valid_moves(valid_moves.keys())
     pygame.display.update()
+    game.invalidate()
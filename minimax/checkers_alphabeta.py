@@ -0,0 +1,324 @@
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_zobrist import position_key
+from .checkers_stats import unwrap
+from .checkers_transposition import EXACT, LOWER, UPPER
+
+
+"""
+Alpha-beta search for the checkers AI. It returns the same (score, board)
+result as minimax_algorithm but skips the branches that can not change the
+result, so it reaches a much larger depth in the same time.
+
+Moves are searched in this order, which makes cutoffs happen early:
+
+0) the best move stored in the transposition table, if one is used.
+1) captures, the ones taking more pieces first.
+2) moves that crown a piece.
+3) killer moves: quiet moves that caused a cutoff at the same ply elsewhere in the tree.
+4) everything else, by history score (how often and how deep the move caused cutoffs).
+
+The searcher works with any board that provides get_all_moves, make_move,
+unmake_move, apply_move, is_promotion, winner and evaluate (Board and
+BitBoard both do). Moves are played in place and taken back, so the only
+board copied during a search is the one returned for the best move. Moves are
+identified by their (from, to) squares for the killer and history tables.
+
+With a TranspositionTable (see checkers_transposition) positions already
+searched deep enough are not searched again; boards must then also keep a
+zobrist hash, which Board and BitBoard do.
+
+With a Tablebase (see checkers_tablebase), positions with few enough pieces
+are scored exactly from the tablebase instead of being searched further.
+
+With an evaluate function, leaves are scored with evaluate(board) instead
+of board.evaluate(). It must score from WHITE's point of view like
+Board.evaluate, and the searcher's transposition table must not be shared
+with a searcher using another evaluation.
+
+With a batch_evaluate function as well, the nodes one ply above the leaves
+collect the (white, yellow, kings) masks of all their children
+(BitBoard.child_masks) and score them with a single batch_evaluate(masks) call, which
+must return a NumPy array of the scores evaluate would give them, in
+order (see checkers_batch_eval).
+This needs a BitBoard.
+
+After a search, the counters nodes and cutoffs tell how much work was done
+and best_move holds the move that led to the returned board.
+
+With a SearchStats (see checkers_stats) in stats, every search fills it in:
+nodes per ply, leaves, time per phase, cutoffs and table hits. The search
+then reaches the board through stats.wrap; without stats it calls the
+board directly and costs nothing extra.
+
+A search can be given a stop function, called every STOP_CHECK_NODES nodes;
+when it returns True the search raises SearchStopped. The position passed
+to such a search is left in an undefined state, so search a copy.
+
+"""
+
+
+class SearchStopped(Exception):
+    pass
+
+
+class AlphaBeta:
+    KILLERS_PER_PLY = 2
+    STOP_CHECK_NODES = 256
+
+    def __init__(self, table=None, tablebase=None, evaluate=None, batch_evaluate=None, stats=None):
+        self.table = table
+        self.tablebase = tablebase
+        self.evaluate = evaluate
+        self.batch_evaluate = batch_evaluate
+        self.stats = stats
+        self._leaf = _board_evaluate
+        self.killers = {}
+        self.history = {}
+        self.nodes = 0
+        self.cutoffs = 0
+        self.best_move = None
+        self._stop = None
+
+    """
+
+    search(self, position, depth, max_player, first_move=None, stop=None): Method
+    that runs the search from position and returns (score, board) where board
+    is the position after the best move, like minimax_algorithm. first_move,
+    a (from, to) pair, is searched first at the root. The killer and history
+    tables are kept between searches; the counters are reset.
+
+    """
+
+    def search(self, position, depth, max_player, first_move=None, stop=None):
+        self.nodes = 0
+        self.cutoffs = 0
+        self.best_move = None
+        self._stop = stop
+        if self.table is not None:
+            self.table.new_search()
+        if self.stats is None:
+            self._leaf = _board_evaluate if self.evaluate is None else self.evaluate
+            return self._root(position, depth, max_player, first_move)
+
+        self._leaf = _board_evaluate
+        self.stats.begin(self)
+        try:
+            score, board = self._root(self.stats.wrap(position, self.evaluate), depth, max_player, first_move)
+        finally:
+            self.stats.end(self)
+        return score, unwrap(board)
+
+    """
+
+    score(self, position, depth, max_player, alpha, beta): Method that returns the
+    score of position searched with the window (alpha, beta): exact when it
+    lies strictly inside the window, otherwise a bound on the side it fell.
+    position is searched in place and restored.
+
+    """
+
+    def score(self, position, depth, max_player, alpha=float('-inf'), beta=float('inf')):
+        self.nodes = 0
+        self.cutoffs = 0
+        self._stop = None
+        if self.table is not None:
+            self.table.new_search()
+        if self.stats is None:
+            self._leaf = _board_evaluate if self.evaluate is None else self.evaluate
+            return self._alpha_beta(position, depth, 0, alpha, beta, max_player)
+
+        self._leaf = _board_evaluate
+        self.stats.begin(self)
+        try:
+            return self._alpha_beta(self.stats.wrap(position, self.evaluate), depth, 0, alpha, beta, max_player)
+        finally:
+            self.stats.end(self)
+
+    def _root(self, position, depth, max_player, first_move):
+        if depth == 0 or position.winner() != None:
+            return self._leaf(position), position
+
+        self.nodes += 1
+        color = WHITE if max_player else YELLOW
+        key, table_move = self._probe_move(position, color)
+        if first_move is not None:
+            table_move = first_move
+        alpha, beta = float('-inf'), float('inf')
+        best_score = alpha if max_player else beta
+        best_move = None
+        for move in self.order_moves(position, position.get_all_moves(color), 0, table_move):
+            undo = position.make_move(move)
+            score = self._alpha_beta(position, depth - 1, 1, alpha, beta, not max_player)
+            position.unmake_move(undo)
+            if best_move is None or (score > best_score if max_player else score < best_score):
+                best_score, best_move = score, move
+            if max_player:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+
+        if best_move is None:
+            return best_score, None
+        self.best_move = best_move
+        if self.table is not None:
+            self.table.store(key, depth, EXACT, best_score, (best_move[0], best_move[1]))
+        return best_score, position.apply_move(best_move)
+
+    def _probe_move(self, board, color):
+        if self.table is None:
+            return None, None
+        key = position_key(board, color)
+        entry = self.table.probe(key)
+        return key, entry[4] if entry is not None else None
+
+    """
+
+    _alpha_beta(self, board, depth, ply, alpha, beta, max_player): Private helper
+    that returns the score of board, exact when it lies strictly between
+    alpha and beta and a bound otherwise. A side without moves scores like in
+    minimax_algorithm: -inf for the max player and +inf for the min player.
+
+    """
+
+    def _alpha_beta(self, board, depth, ply, alpha, beta, max_player):
+        if depth == 0 or board.winner() != None:
+            return self._leaf(board)
+
+        self.nodes += 1
+        if self._stop is not None and not self.nodes % self.STOP_CHECK_NODES and self._stop():
+            raise SearchStopped()
+        color = WHITE if max_player else YELLOW
+        if self.tablebase is not None and board.white_left + board.red_left <= self.tablebase.max_pieces:
+            score = self.tablebase.score(unwrap(board), color)
+            if score is not None:
+                return score
+        table_move = None
+        if self.table is not None:
+            key = position_key(board, color)
+            entry = self.table.probe(key)
+            if entry is not None:
+                table_move = entry[4]
+                if entry[1] >= depth:
+                    score, bound = entry[3], entry[2]
+                    if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                        return score
+        alpha_start, beta_start = alpha, beta
+
+        best_move = None
+        moves = board.get_all_moves(color)
+        if depth == 1 and self.batch_evaluate is not None and moves:
+            value, best_move = self._batch_leaves(board, moves, max_player)
+            if (value >= beta) if max_player else (value <= alpha):
+                self._record_cutoff(best_move, depth, ply)
+        elif max_player:
+            value = float('-inf')
+            for move in self.order_moves(board, moves, ply, table_move):
+                undo = board.make_move(move)
+                score = self._alpha_beta(board, depth - 1, ply + 1, alpha, beta, False)
+                board.unmake_move(undo)
+                if best_move is None or score > value:
+                    value, best_move = score, move
+                if value >= beta:
+                    self._record_cutoff(move, depth, ply)
+                    break
+                alpha = max(alpha, value)
+        else:
+            value = float('inf')
+            for move in self.order_moves(board, moves, ply, table_move):
+                undo = board.make_move(move)
+                score = self._alpha_beta(board, depth - 1, ply + 1, alpha, beta, True)
+                board.unmake_move(undo)
+                if best_move is None or score < value:
+                    value, best_move = score, move
+                if value <= alpha:
+                    self._record_cutoff(move, depth, ply)
+                    break
+                beta = min(beta, value)
+
+        if self.table is not None:
+            if value <= alpha_start:
+                bound = UPPER
+            elif value >= beta_start:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.table.store(key, depth, bound, value, (best_move[0], best_move[1]) if best_move else None)
+        return value
+
+    """
+
+    _batch_leaves(self, board, moves, max_player): Private helper that scores
+    the children of board, one ply above the leaves, with one batch_evaluate
+    call and returns the best (score, move) for the side to move.
+
+    """
+
+    def _batch_leaves(self, board, moves, max_player):
+        masks = [board.child_masks(move) for move in moves]
+        if self.stats is None:
+            scores = self.batch_evaluate(masks)
+        else:
+            scores = self.stats.time_batch(self.batch_evaluate, masks)
+        best = int(scores.argmax() if max_player else scores.argmin())
+        return float(scores[best]), moves[best]
+
+    """
+
+    order_moves(self, board, moves, ply, table_move=None): Method that returns the
+    moves sorted in search order (table move, captures, promotions, killers, history).
+
+    """
+
+    def order_moves(self, board, moves, ply, table_move=None):
+        if len(moves) < 2:
+            return moves
+        killers = self.killers.get(ply, ())
+        history = self.history
+
+        def priority(move):
+            if table_move is not None and (move[0], move[1]) == table_move:
+                return (4, 0)
+            if move[2]:
+                return (3, _captured_count(move[2]))
+            if board.is_promotion(move):
+                return (2, 0)
+            key = (move[0], move[1])
+            if key in killers:
+                return (1, -killers.index(key))
+            return (0, history.get(key, 0))
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def _record_cutoff(self, move, depth, ply):
+        self.cutoffs += 1
+        if move[2]:
+            return
+        key = (move[0], move[1])
+        self.history[key] = self.history.get(key, 0) + depth * depth
+        killers = self.killers.setdefault(ply, [])
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[self.KILLERS_PER_PLY:]
+
+
+def _board_evaluate(board):
+    return board.evaluate()
+
+
+def _captured_count(captured):
+    if isinstance(captured, int):
+        return bin(captured).count('1')
+    return len(captured)
+
+
+"""
+
+alpha_beta_algorithm(position, depth, max_player, game): Function with the same
+arguments and result as minimax_algorithm that runs a fresh alpha-beta search.
+Use an AlphaBeta object directly to keep the move-ordering tables and a
+transposition table between moves, or to read the node and cutoff counters.
+
+"""
+
+def alpha_beta_algorithm(position, depth, max_player, game):
+    return AlphaBeta().search(position, depth, max_player)
@@ -0,0 +1,208 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import json
+import math
+import os
+import sys
+from checkers.checkers_constant import WHITE
+from checkers.checkers_pdn import read_games, write_game, move_text
+from .checkers_alphabeta import AlphaBeta
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Bulk analysis of PDN game archives (see checkers_pdn). Every game is
+replayed and every position in it is searched by the engine, to find the
+moves that threw away a large part of the score: the blunders.
+
+For each position the engine searches the best move to depth plies and
+scores the move that was played to depth - 1 plies below it. The loss of a
+move is how much worse it scores than the best move, from the side of the
+player who made it, in pieces. A move that loses threshold or more is a
+blunder ('?'), one that loses twice as much a bad blunder ('??'). It gets a
+comment with the loss and the move the engine preferred:
+
+    12. 14-18? {blunder: loses 1.20, best 9-14 (+0.35)}
+
+Games are read one at a time and handed out to a pool of worker processes,
+one game per task, with only a few games queued per worker. Each worker
+keeps one searcher whose transposition table carries over from one
+position of a game to the next. The annotated games are written in the
+order they were read, each as soon as it and the games before it are done,
+so archives of any size are analysed with flat memory and a run that is
+stopped keeps all the games written so far. Each blunder can also be
+logged as one JSON line:
+
+    {"game": 3, "ply": 23, "move": "14-18", "best": "9-14", "loss": 1.2, "score": 0.35}
+
+A game with an illegal move is written unchanged, with the error in a
+comment.
+
+    python -m minimax.checkers_analysis games.pdn --depth 6 --output annotated.pdn --blunders blunders.jsonl
+
+"""
+
+DEFAULT_THRESHOLD = 0.8
+
+
+_searcher = None
+
+
+def _analysis_searcher():
+    global _searcher
+    if _searcher is None:
+        _searcher = AlphaBeta(TranspositionTable(1 << 16))
+    _searcher.table.clear()
+    _searcher.killers.clear()
+    _searcher.history.clear()
+    return _searcher
+
+
+"""
+
+analyse_game(game_id, game, depth, threshold): Function run in a worker
+process that annotates the blunders of a PDNGame in place. It returns
+(game, blunders, positions, error): the annotated game, the list of blunder
+records, the number of positions searched and the error message of an
+illegal move, or None.
+
+"""
+
+def analyse_game(game_id, game, depth, threshold=DEFAULT_THRESHOLD):
+    searcher = _analysis_searcher()
+    blunders, positions = [], 0
+    try:
+        for ply, (board, color, move) in enumerate(game.replay()):
+            max_player = color == WHITE
+            best_score, _ = searcher.search(board, depth, max_player)
+            best_move = searcher.best_move
+            positions += 1
+            if best_move is None or (best_move[0], best_move[1]) == (move[0], move[1]):
+                continue
+
+            undo = board.make_move(move)
+            played_score = searcher.score(board, depth - 1, not max_player)
+            board.unmake_move(undo)
+            loss = _loss(best_score, played_score, max_player)
+            if loss < threshold:
+                continue
+
+            best = move_text(best_move)
+            game.moves[ply] = game.moves[ply].rstrip('!?') + ('??' if loss >= 2 * threshold else '?')
+            _annotate(game, ply + 1, 'blunder: loses %s, best %s (%s)'
+                      % (_format(loss, '%.2f'), best, _format(best_score, '%+.2f')))
+            blunders.append({'game': game_id, 'ply': ply + 1, 'move': move_text(move), 'best': best,
+                             'loss': _json_number(loss), 'score': _json_number(best_score)})
+    except ValueError as error:
+        _annotate(game, 0, 'not analysed: %s' % error)
+        return game, [], positions, str(error)
+    return game, blunders, positions, None
+
+
+def _loss(best_score, played_score, max_player):
+    if best_score == played_score:
+        return 0.0
+    return best_score - played_score if max_player else played_score - best_score
+
+
+def _annotate(game, ply, text):
+    game.comments[ply] = game.comments[ply] + ' ' + text if ply in game.comments else text
+
+
+def _format(score, form):
+    return form % score if math.isfinite(score) else ('+inf' if score > 0 else '-inf')
+
+
+def _json_number(score):
+    return round(score, 3) if math.isfinite(score) else _format(score, '')
+
+
+class AnalysisSummary:
+    def __init__(self):
+        self.games = 0
+        self.positions = 0
+        self.blunders = 0
+        self.errors = 0
+
+    def report(self):
+        return '%d games, %d positions, %d blunders, %d games with errors' % (
+            self.games, self.positions, self.blunders, self.errors)
+
+
+"""
+
+run_analysis(games, depth, threshold, workers, output, blunders_log, progress):
+Function that analyses an iterable of PDNGames (such as read_games over an
+open file) over a pool of workers. Each annotated game is written to the
+output file object and its blunders to the blunders_log file object (both
+optional) in input order, as soon as they are ready. progress, if given,
+is called with the AnalysisSummary after every game. It returns the
+AnalysisSummary.
+
+"""
+
+def run_analysis(games, depth, threshold=DEFAULT_THRESHOLD, workers=None, output=None, blunders_log=None,
+                 progress=None):
+    summary = AnalysisSummary()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for game_id, game in enumerate(games):
+            pending.append(executor.submit(analyse_game, game_id, game, depth, threshold))
+            if len(pending) >= 2 * workers:
+                _write(pending.popleft().result(), summary, output, blunders_log, progress)
+        while pending:
+            _write(pending.popleft().result(), summary, output, blunders_log, progress)
+    return summary
+
+
+def _write(result, summary, output, blunders_log, progress):
+    game, blunders, positions, error = result
+    summary.games += 1
+    summary.positions += positions
+    summary.blunders += len(blunders)
+    summary.errors += error is not None
+    if output is not None:
+        write_game(output, game)
+        output.flush()
+    if blunders_log is not None:
+        for blunder in blunders:
+            blunders_log.write(json.dumps(blunder, separators=(',', ':')) + '\n')
+        blunders_log.flush()
+    if progress is not None:
+        progress(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Annotate the blunders of the games in a PDN file.')
+    parser.add_argument('games', help='PDN file to analyse')
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='smallest loss, in pieces, that makes a blunder')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', help='file the annotated games are written to')
+    parser.add_argument('--blunders', help='file the blunders are appended to, one JSON line each')
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error('the depth must be at least 1')
+
+    def progress(summary):
+        if summary.games % 100 == 0:
+            print(summary.report(), file=sys.stderr)
+
+    output = open(args.output, 'w') if args.output else None
+    blunders_log = open(args.blunders, 'a') if args.blunders else None
+    try:
+        with open(args.games) as games:
+            summary = run_analysis(read_games(games), args.depth, args.threshold, args.workers, output,
+                                   blunders_log, progress)
+    finally:
+        for log in (output, blunders_log):
+            if log is not None:
+                log.close()
+    print(summary.report())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+import argparse
+import time
+import numpy as np
+from checkers.checkers_evaluation import (FEATURES, WEIGHTS, FEATURE_TABLE, KINDS, CODES,
+                                          piece_square_values, byte_tables, evaluate_masks)
+from checkers.checkers_squares import SQUARES
+from .checkers_alphabeta import AlphaBeta
+from .checkers_parallel import benchmark_positions
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Batched evaluation of positions with NumPy. Instead of scoring one leaf at
+a time, a whole batch of positions is scored with the positional terms of
+checkers_evaluation (material, kings, advancement, center control, back
+rank) in one vectorized call.
+
+A batch is either an (N, 32) array of square codes (see
+checkers_evaluation), one row per position, which square_codes builds from
+BitBoard masks, or the (white, yellow, kings) masks themselves.
+features(codes) returns the unweighted terms, for fitting the weights.
+
+BatchEvaluator also plugs into AlphaBeta: batch_searcher returns a searcher
+that, at the nodes one ply above the leaves, collects the masks of all the
+children and scores them in a single evaluate_masks call. It returns the
+same scores, up to float rounding, as scoring one position at a time with
+evaluate_board.
+
+A NumPy call costs about as much as scoring ten positions with the byte
+tables of evaluate_board, and the batch scores the siblings a cutoff would
+have skipped, so with these table-driven terms batching the search does not
+pay: run the module to compare. It pays off once the evaluation has terms
+that cost more per position than a table lookup.
+
+numpy is only needed by this module:
+
+    pip install numpy
+    python -m minimax.checkers_batch_eval --depth 6
+
+"""
+
+SQUARE_INDEX = np.arange(SQUARES)
+SHIFTS = np.arange(SQUARES, dtype=np.uint64)
+BYTE_INDEX = np.arange(4 * len(KINDS))
+
+# FEATURE_ARRAY[code, square] holds the FEATURES terms of the piece coded on
+# the square; EMPTY squares add nothing.
+FEATURE_ARRAY = np.zeros((CODES, SQUARES, len(FEATURES)))
+for _kind in KINDS:
+    FEATURE_ARRAY[_kind + 1] = FEATURE_TABLE[_kind]
+
+
+"""
+
+square_codes(masks): Function that turns a sequence of (white, yellow, kings)
+BitBoard masks into an (N, 32) int8 array of square codes.
+
+features(codes): Function that returns the (N, len(FEATURES)) array of the
+unweighted terms of every position of a batch.
+
+"""
+
+def square_codes(masks):
+    masks = np.asarray(masks, dtype=np.uint64).reshape(-1, 3)
+    bits = ((masks[:, :, None] >> SHIFTS) & 1).astype(np.int8)
+    white, yellow, kings = bits[:, 0], bits[:, 1], bits[:, 2]
+    return white * (1 + kings) + yellow * (3 + kings)
+
+
+def features(codes):
+    return FEATURE_ARRAY[codes, SQUARE_INDEX].sum(axis=1)
+
+
+class BatchEvaluator:
+    def __init__(self, weights=None):
+        self.weights = dict(weights if weights is not None else WEIGHTS)
+        self.values = piece_square_values(self.weights)
+        self.tables = byte_tables(self.values)
+        self._codes = np.zeros((CODES, SQUARES))
+        for kind in KINDS:
+            self._codes[kind + 1] = self.values[kind]
+        self._bytes = np.array(self.tables).reshape(4 * len(KINDS), 256)
+
+    """
+
+    evaluate_codes(self, codes): Method that returns the scores of a batch of
+    square codes as a float array, from WHITE's point of view.
+
+    evaluate_masks(self, masks): Method that scores a sequence of
+    (white, yellow, kings) masks in one call. It splits the masks by piece
+    kind, views them as bytes and sums 16 byte-table lookups per position.
+
+    evaluate_board(self, board): Method that scores a single BitBoard without
+    NumPy, with the same byte tables, for the leaves the search does not batch.
+
+    """
+
+    def evaluate_codes(self, codes):
+        return self._codes[codes, SQUARE_INDEX].sum(axis=1)
+
+    def evaluate_masks(self, masks):
+        masks = np.array(masks, dtype='<u4').reshape(-1, 3)
+        white, yellow, kings = masks[:, 0], masks[:, 1], masks[:, 2]
+        men = ~kings
+        by_kind = np.empty((len(masks), len(KINDS)), dtype='<u4')
+        np.bitwise_and(white, men, out=by_kind[:, 0])
+        np.bitwise_and(white, kings, out=by_kind[:, 1])
+        np.bitwise_and(yellow, men, out=by_kind[:, 2])
+        np.bitwise_and(yellow, kings, out=by_kind[:, 3])
+        return self._bytes[BYTE_INDEX, by_kind.view(np.uint8)].sum(axis=1)
+
+    def evaluate_board(self, board):
+        return evaluate_masks(board.white, board.yellow, board.kings, self.tables)
+
+
+"""
+
+batch_searcher(evaluator, table): Function that returns an AlphaBeta searcher
+scoring its leaves with evaluator, in batches of siblings.
+
+"""
+
+def batch_searcher(evaluator=None, table=None):
+    evaluator = evaluator or BatchEvaluator()
+    return AlphaBeta(table, evaluate=evaluator.evaluate_board, batch_evaluate=evaluator.evaluate_masks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare batched and one-by-one leaf evaluation.')
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--positions', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    evaluator = BatchEvaluator()
+    searchers = (('incremental', AlphaBeta(TranspositionTable())),
+                 ('byte tables', AlphaBeta(TranspositionTable(), evaluate=evaluator.evaluate_board)),
+                 ('batched', batch_searcher(evaluator, TranspositionTable())))
+    positions = benchmark_positions(args.positions, args.seed)
+    print('%-20s  %9s  %10s  %9s' % ('evaluation', 'seconds', 'nodes', 'nodes/s'))
+    for name, searcher in searchers:
+        nodes, seconds = 0, 0.0
+        for board, max_player in positions:
+            searcher.table.clear()
+            start = time.perf_counter()
+            searcher.search(board.copy(), args.depth, max_player)
+            seconds += time.perf_counter() - start
+            nodes += searcher.nodes
+        print('%-20s  %9.3f  %10d  %9.0f' % (name, seconds, nodes, nodes / seconds))
+
+
+if __name__ == '__main__':
+    main()
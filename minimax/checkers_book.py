@@ -0,0 +1,171 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import mmap
+import os
+import struct
+from checkers.checkers_bitboard import BitBoard, convert_move
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_zobrist import position_key
+from .checkers_alphabeta import AlphaBeta
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Opening book. Every game starts from the same position, so the best moves of
+the first plies can be searched deeply once, offline, and looked up during
+play instead of searched again.
+
+The book file is a 16-byte header (MAGIC and the record count) followed by
+fixed-size records sorted by key:
+
+    key       uint64   Zobrist hash with the side to move (checkers_zobrist.position_key)
+    from_sq   uint8    square (0..31, see checkers_squares) of the piece to move
+    to_sq     uint8    square it moves to
+    (6 bytes padding)
+    score     float64  score of the position searched at the build depth
+
+OpeningBook memory-maps the file and binary-searches it, so opening a book
+reads nothing up front and only the pages touched by lookups become resident.
+Scores are kept as float64, so a book score is the exact score the search
+returned. Books written with float32 scores (MAGIC CKRBOOK1) must be
+rebuilt.
+
+Build a book with:
+
+    python -m minimax.checkers_book --plies 6 --depth 10 --output opening_book.bin
+
+"""
+
+MAGIC = b'CKRBOOK2'
+HEADER = struct.Struct('<8sI4x')
+RECORD = struct.Struct('<QBB6xd')
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError('%s is not an opening book' % path)
+
+    """
+
+    lookup(self, board, color): Method that returns the book move of color in
+    board as a (from_square, to_square, captured) move of board.get_all_moves,
+    plus its score, or (None, None) when the position is not in the book.
+    board may be a BitBoard or a Board.
+
+    """
+
+    def lookup(self, board, color):
+        record = self.find(position_key(board, color))
+        if record is None:
+            return None, None
+
+        bitboard = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        for move in bitboard.get_all_moves(color):
+            if move[0] == record[1] and move[1] == record[2]:
+                return convert_move(board, move, color), record[3]
+        return None, None
+
+    """
+
+    find(self, key): Method that binary-searches the records for key and
+    returns (key, from_sq, to_sq, score), or None.
+
+    """
+
+    def find(self, key):
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            record = RECORD.unpack_from(self._map, HEADER.size + middle * RECORD.size)
+            if record[0] < key:
+                low = middle + 1
+            elif record[0] > key:
+                high = middle
+            else:
+                return record
+        return None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+"""
+
+book_positions(plies): Function that returns every position reachable from
+the start in fewer than plies plies, as a dictionary mapping the key to
+(packed BitBoard, color to move). YELLOW moves first, as in Game.
+
+"""
+
+def book_positions(plies):
+    positions = {}
+    frontier = [(BitBoard(), YELLOW)]
+    for _ in range(plies):
+        next_frontier = []
+        for board, color in frontier:
+            key = position_key(board, color)
+            if key in positions or board.winner() != None:
+                continue
+            positions[key] = (board.pack(), color)
+            other = WHITE if color == YELLOW else YELLOW
+            next_frontier.extend((child, other) for child in board.successors(color))
+        frontier = next_frontier
+    return positions
+
+
+def _search_position(packed, color, depth):
+    board = BitBoard.unpack(packed)
+    searcher = AlphaBeta(TranspositionTable())
+    score, child = searcher.search(board, depth, color == WHITE)
+    if child is None:
+        return None
+    return searcher.best_move[0], searcher.best_move[1], score
+
+
+"""
+
+build_book(path, plies, depth, workers): Function that searches every book
+position to depth, spread over a pool of workers, and writes the sorted
+book file to path. It returns the number of records written.
+
+"""
+
+def build_book(path, plies=6, depth=10, workers=None):
+    positions = book_positions(plies)
+    keys = sorted(positions)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_search_position, [positions[key][0] for key in keys],
+                               [positions[key][1] for key in keys], [depth] * len(keys), chunksize=4)
+        records = [(key,) + result for key, result in zip(keys, results) if result is not None]
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, len(records)))
+        for record in records:
+            output.write(RECORD.pack(*record))
+    os.replace(temporary, path)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening book.')
+    parser.add_argument('--plies', type=int, default=6, help='number of plies from the start covered by the book')
+    parser.add_argument('--depth', type=int, default=10, help='search depth for each book position')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default='opening_book.bin')
+    args = parser.parse_args()
+    count = build_book(args.output, args.plies, args.depth, args.workers)
+    print('wrote %d positions to %s' % (count, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+import argparse
+import os
+import sqlite3
+import time
+from checkers.checkers_bitboard import BitBoard, convert_move
+from checkers.checkers_constant import WHITE
+from checkers.checkers_zobrist import position_key
+
+
+"""
+Persistent analysis cache. It keeps the result of every search the AI has
+finished (best move, score and depth) in an SQLite file, so later sessions
+and other processes start from what was already searched instead of a
+cold engine.
+
+A position is found by its Zobrist hash with the side to move
+(checkers_zobrist.position_key) and checked against the stored position
+(BitBoard.encode() and the side to move), so a hash collision is a miss,
+never a wrong move. A lookup only returns results searched at least as
+deep as asked for. Storing a position again keeps the deeper result.
+
+The database runs in WAL mode, so any number of processes can read while
+one writes. Each process opens its own AnalysisCache. Writes are kept in
+memory and written in one transaction when batch_size of them are pending
+or flush_seconds have passed since the last write, and by flush() and
+close(). Every lookup that hits marks the entry as used; when the cache
+holds more than max_entries positions, the least recently used are
+evicted down to nine tenths of the cap. The number of positions is counted
+once when the cache is opened and then kept up to date by the writes; it
+is only counted again, to take the writes of other processes into
+account, when it goes over the cap.
+
+    python -m minimax.checkers_cache analysis_cache.db --info
+    python -m minimax.checkers_cache analysis_cache.db --max-entries 100000
+
+"""
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS positions (
+    key INTEGER PRIMARY KEY,
+    position BLOB NOT NULL,
+    depth INTEGER NOT NULL,
+    score REAL NOT NULL,
+    from_sq INTEGER NOT NULL,
+    to_sq INTEGER NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_used ON positions (used);
+'''
+
+STORED_BATCH = 500
+
+UPSERT = '''
+INSERT INTO positions (key, position, depth, score, from_sq, to_sq, used) VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (key) DO UPDATE SET
+    position = excluded.position, depth = excluded.depth, score = excluded.score,
+    from_sq = excluded.from_sq, to_sq = excluded.to_sq, used = excluded.used
+WHERE excluded.depth >= positions.depth OR excluded.position != positions.position
+'''
+
+
+class AnalysisCache:
+    def __init__(self, path, max_entries=1000000, batch_size=256, flush_seconds=5.0):
+        self.path = path
+        self.max_entries = max_entries
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.hits = 0
+        self.misses = 0
+        self._pending = {}
+        self._used = {}
+        self._last_flush = time.monotonic()
+        self._connection = sqlite3.connect(path, timeout=30)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._count = len(self)
+
+    """
+
+    lookup(self, board, color, depth): Method that returns the cached result
+    for color to move in board if it was searched to depth or deeper, as
+    (move, score, depth) with move a move of board.get_all_moves, or
+    (None, None, None). board may be a BitBoard or a Board.
+
+    store(self, board, color, depth, score, move): Method that caches the
+    result of a search of board to depth: its score and best move, given as
+    a BitBoard move or a (from_square, to_square) pair.
+
+    """
+
+    def lookup(self, board, color, depth):
+        bitboard = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        key = _sql_key(position_key(bitboard, color))
+        position = _position(bitboard, color)
+        row = self._pending.get(key)
+        if row is None:
+            row = self._connection.execute('SELECT key, position, depth, score, from_sq, to_sq FROM positions '
+                                           'WHERE key = ?', (key,)).fetchone()
+        if row is None or row[1] != position or row[2] < depth:
+            self.misses += 1
+            return None, None, None
+
+        for move in bitboard.get_all_moves(color):
+            if move[0] == row[4] and move[1] == row[5]:
+                self.hits += 1
+                self._used[key] = time.time()
+                self._maybe_flush()
+                return convert_move(board, move, color), row[3], row[2]
+        self.misses += 1
+        return None, None, None
+
+    def store(self, board, color, depth, score, move):
+        bitboard = board if isinstance(board, BitBoard) else BitBoard.from_board(board)
+        key = _sql_key(position_key(bitboard, color))
+        pending = self._pending.get(key)
+        if pending is not None and pending[1] == _position(bitboard, color) and pending[2] > depth:
+            return
+        self._pending[key] = (key, _position(bitboard, color), depth, score, move[0], move[1], time.time())
+        self._maybe_flush()
+
+    """
+
+    flush(self): Method that writes the pending results and use marks in one
+    transaction and evicts the least recently used entries above max_entries.
+
+    evict(self): Method that evicts the least recently used entries when
+    there are more than max_entries and returns how many it removed.
+
+    """
+
+    def flush(self):
+        if self._pending or self._used:
+            with self._connection:
+                self._count += len(self._pending) - self._stored(list(self._pending))
+                self._connection.executemany(UPSERT, list(self._pending.values()))
+                self._connection.executemany('UPDATE positions SET used = ? WHERE key = ? AND used < ?',
+                                             [(used, key, used) for key, used in self._used.items()])
+            self._pending.clear()
+            self._used.clear()
+            self.evict()
+        self._last_flush = time.monotonic()
+
+    def evict(self):
+        if self._count <= self.max_entries:
+            return 0
+        self._count = len(self)
+        if self._count <= self.max_entries:
+            return 0
+        with self._connection:
+            removed = self._connection.execute('DELETE FROM positions WHERE key IN '
+                                               '(SELECT key FROM positions ORDER BY used LIMIT ?)',
+                                               (self._count - self.max_entries * 9 // 10,)).rowcount
+        self._count -= removed
+        return removed
+
+    def _stored(self, keys):
+        stored = 0
+        for start in range(0, len(keys), STORED_BATCH):
+            batch = keys[start:start + STORED_BATCH]
+            stored += self._connection.execute('SELECT COUNT(*) FROM positions WHERE key IN (%s)'
+                                               % ','.join('?' * len(batch)), batch).fetchone()[0]
+        return stored
+
+    def _maybe_flush(self):
+        if (len(self._pending) + len(self._used) >= self.batch_size
+                or time.monotonic() - self._last_flush >= self.flush_seconds):
+            self.flush()
+
+    def __len__(self):
+        return self._connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _sql_key(key):
+    # SQLite integers are signed 64-bit.
+    return key - (1 << 64) if key >= 1 << 63 else key
+
+
+def _position(board, color):
+    return board.encode() + (b'w' if color == WHITE else b'y')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or trim a persistent analysis cache.')
+    parser.add_argument('path')
+    parser.add_argument('--info', action='store_true', help='print the number of positions and their depths')
+    parser.add_argument('--max-entries', type=int, default=None,
+                        help='evict the least recently used positions above this many')
+    args = parser.parse_args()
+    if not os.path.exists(args.path):
+        parser.error('%s does not exist' % args.path)
+
+    with AnalysisCache(args.path, max_entries=args.max_entries or 1 << 62) as cache:
+        if args.max_entries is not None:
+            print('evicted %d positions' % cache.evict())
+        if args.info or args.max_entries is None:
+            print('%d positions' % len(cache))
+            for depth, count in cache._connection.execute(
+                    'SELECT depth, COUNT(*) FROM positions GROUP BY depth ORDER BY depth'):
+                print('depth %2d: %d' % (depth, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+from copy import deepcopy
+import time
+from checkers.checkers_constant import YELLOW, WHITE
+from .checkers_alphabeta import AlphaBeta, SearchStopped
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Iterative deepening driver for the AI move. Instead of searching a fixed
+depth, it searches depth 1, 2, 3, ... until a time or node budget runs out
+and returns the result of the deepest search that finished. That keeps the
+time per move predictable whatever the position looks like.
+
+Every iteration searches the best move of the previous one first, and the
+searcher's transposition table and killer/history tables carry over, so
+the shallow iterations make the deep ones cheaper.
+
+The function takes these arguments:
+
+1) position: the board to search from (it is not modified).
+2) max_player: True when WHITE, the maximizing side, is to move.
+3) game: the game being played, accepted for symmetry with minimax_algorithm.
+4) time_limit_ms: wall-clock budget in milliseconds, or None.
+5) node_limit: budget in searched nodes, summed over iterations, or None.
+6) max_depth: the deepest iteration to run.
+7) searcher: the AlphaBeta object to use, so its tables can be kept
+between moves. A new one with a TranspositionTable is made if omitted.
+8) cancel: a function that ends the search early when it returns True,
+used to cancel a search running in the background.
+9) stats: a SearchStats (see checkers_stats) to fill in, iteration by
+iteration, or None. It is reset first and stays attached to the searcher
+only for this call.
+
+With only one legal move there is nothing to choose, so it returns at once.
+
+It returns (score, board, depth): the score and resulting board like
+minimax_algorithm, and the depth of the iteration they come from. Depth 1
+always runs to completion, so there is a move whenever one exists.
+
+"""
+
+def iterative_deepening(position, max_player, game=None, time_limit_ms=None, node_limit=None,
+                        max_depth=64, searcher=None, cancel=None, stats=None):
+    if searcher is None:
+        searcher = AlphaBeta(TranspositionTable())
+    if stats is None:
+        return _deepen(position, max_player, time_limit_ms, node_limit, max_depth, searcher, cancel, None)
+
+    stats.reset()
+    attached, searcher.stats = searcher.stats, stats
+    try:
+        return _deepen(position, max_player, time_limit_ms, node_limit, max_depth, searcher, cancel, stats)
+    finally:
+        searcher.stats = attached
+
+
+def _deepen(position, max_player, time_limit_ms, node_limit, max_depth, searcher, cancel, stats):
+    start = time.perf_counter()
+    deadline = None if time_limit_ms is None else start + time_limit_ms / 1000
+    spent = 0
+
+    def stop():
+        if cancel is not None and cancel():
+            return True
+        if deadline is not None and time.perf_counter() >= deadline:
+            return True
+        return node_limit is not None and spent + searcher.nodes >= node_limit
+
+    score, board = searcher.search(deepcopy(position), 1, max_player)
+    result = (score, board, 1)
+    best_move = searcher.best_move
+    spent += searcher.nodes
+    if stats is not None:
+        stats.iteration(1)
+    # A position that is already won or lost has no move to deepen.
+    if board is None or best_move is None or len(position.get_all_moves(WHITE if max_player else YELLOW)) == 1:
+        return result
+
+    for depth in range(2, max_depth + 1):
+        if stop():
+            break
+        try:
+            first_move = None if best_move is None else best_move[:2]
+            score, board = searcher.search(deepcopy(position), depth, max_player, first_move, stop)
+        except SearchStopped:
+            break
+        spent += searcher.nodes
+        if stats is not None:
+            stats.iteration(depth)
+        result = (score, board, depth)
+        best_move = searcher.best_move
+
+    return result
@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from .checkers_server import percentile
+
+
+"""
+Load generator for checkers_server. It opens a number of client
+connections and has each of them play games against the server's AI, one
+game at a time: the client plays a random legal move, asks for the AI
+reply with the given time budget, and so on until the game ends or reaches
+max_plies. Requests refused with "busy" are retried after a short random
+back-off.
+
+At the end it prints the AI requests per second, the latency percentiles
+seen by the clients and the server's own stats:
+
+    python -m minimax.checkers_load --port 8765 --clients 200 --games 1000 --time-ms 50
+
+"""
+
+class LoadClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self._ids = 0
+
+    """
+
+    call(self, op, **fields): Coroutine that sends one request and returns the
+    response.
+
+    """
+
+    async def call(self, op, **fields):
+        self._ids += 1
+        fields.update(id=self._ids, op=op)
+        self.writer.write(json.dumps(fields).encode() + b'\n')
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError('the server closed the connection')
+        return json.loads(line)
+
+
+class LoadReport:
+    def __init__(self):
+        self.games = 0
+        self.requests = 0
+        self.busy = 0
+        self.errors = 0
+        self.latencies = []
+        self.started = time.perf_counter()
+
+    def report(self):
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        return ('%d games, %d AI moves in %.1f s (%.1f/s), %d busy retries, %d errors\n'
+                'client latency ms: p50 %.1f  p90 %.1f  p99 %.1f  max %.1f'
+                % (self.games, self.requests, elapsed, self.requests / elapsed if elapsed else 0.0, self.busy,
+                   self.errors, percentile(latencies, 0.5), percentile(latencies, 0.9),
+                   percentile(latencies, 0.99), percentile(latencies, 1.0)))
+
+
+"""
+
+play_games(host, port, games, time_ms, max_plies, report, rng): Coroutine
+run by each client: it plays games from the shared games counter until it
+runs out, counting into report.
+
+"""
+
+async def play_games(host, port, games, time_ms, max_plies, report, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+    client = LoadClient(reader, writer)
+    try:
+        while games[0] > 0:
+            games[0] -= 1
+            game = await client.call('new')
+            game_id = game['game']
+            for _ in range(max_plies // 2):
+                if game.get('winner') or not game['moves']:
+                    break
+                game = await client.call('move', game=game_id, move=rng.choice(game['moves']))
+                if not game['ok']:
+                    report.errors += 1
+                    break
+                if game['winner']:
+                    break
+                game = await _ai_move(client, game_id, time_ms, report, rng)
+                if game is None:
+                    break
+            await client.call('close', game=game_id)
+            report.games += 1
+    finally:
+        writer.close()
+
+
+async def _ai_move(client, game_id, time_ms, report, rng):
+    while True:
+        start = time.perf_counter()
+        response = await client.call('ai', game=game_id, time_ms=time_ms)
+        if response['ok']:
+            report.requests += 1
+            report.latencies.append(1000 * (time.perf_counter() - start))
+            return response
+        if response['error'] != 'busy':
+            report.errors += 1
+            return None
+        report.busy += 1
+        await asyncio.sleep(rng.uniform(0.01, 0.05))
+
+
+"""
+
+run_load(host, port, clients, games, time_ms, max_plies, seed): Coroutine
+that runs the clients to completion and returns (LoadReport, server stats).
+
+"""
+
+async def run_load(host, port, clients, games, time_ms=50, max_plies=60, seed=0):
+    report = LoadReport()
+    remaining = [games]
+    await asyncio.gather(*(play_games(host, port, remaining, time_ms, max_plies, report,
+                                      random.Random(seed * 100003 + client))
+                           for client in range(clients)))
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        stats = await LoadClient(reader, writer).call('stats')
+    finally:
+        writer.close()
+    return report, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play many games against a checkers server at once.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--time-ms', type=int, default=50)
+    parser.add_argument('--max-plies', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    report, stats = asyncio.run(run_load(args.host, args.port, args.clients, args.games, args.time_ms,
+                                         args.max_plies, args.seed))
+    print(report.report())
+    print('server: %s' % json.dumps(stats))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,301 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import json
+import math
+import os
+import sys
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_pdn import parse_fen, fen_of, move_text
+from checkers.checkers_squares import SQUARES
+from checkers.checkers_zobrist import position_key
+from .checkers_alphabeta import AlphaBeta
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Multi-PV analysis of many positions, for hints and puzzle sets computed
+offline. For each position it finds the best few moves of the side to
+move, each with its score and principal variation (the line both sides are
+expected to play after it).
+
+Positions are read from a file in one of two encodings:
+
+    text: one PDN FEN per line (see checkers_pdn), such as
+          B:W21,22,23,K30:B1,5,K10
+          Empty lines and lines starting with # are skipped.
+    binary: RECORD_SIZE-byte records, the 32 bytes of Board.encode() (or
+          BitBoard.encode()) followed by b'w' or b'y' for the side to move
+          (see encode_position).
+
+Every root move is searched to depth - 1 plies below it. Once lines moves
+have been found, the others are searched with a window that only proves
+whether they beat the worst of them, so most of them cost little more than
+a cutoff. The principal variation is read back from the transposition
+table. Scores are from WHITE's point of view, like Board.evaluate, and the
+lines are sorted best first for the side to move.
+
+The positions are handed out to a pool of worker processes in chunks, with
+only a few chunks queued per worker, and the results are written in input
+order as soon as they are ready, one JSON line per position:
+
+    {"position": 0, "fen": "B:W21,...:B1,...", "depth": 6, "nodes": 5120,
+     "lines": [{"move": "11-15", "score": 0.1, "pv": ["11-15", "23-19", ...]}, ...]}
+
+A position that can not be read gets {"position": n, "error": "..."}
+instead. The memory used stays the same for files of any size.
+
+    python -m minimax.checkers_multipv positions.fen --depth 6 --lines 3 --output hints.jsonl
+
+"""
+
+RECORD_SIZE = SQUARES + 1
+CHUNK_SIZE = 64
+
+
+"""
+
+encode_position(board, color), decode_position(data): Functions that
+convert a position and the side to move to and from a binary record.
+
+read_positions(file, binary): Generator that yields the records of an open
+file, FEN strings for text or RECORD_SIZE-byte strings for binary.
+
+parse_position(record): Function that returns the (BitBoard, color to move)
+of a record. It raises a ValueError if the record is not a position.
+
+"""
+
+def encode_position(board, color):
+    return board.encode() + (b'w' if color == WHITE else b'y')
+
+
+def decode_position(data):
+    if len(data) != RECORD_SIZE or data[-1:] not in (b'w', b'y'):
+        raise ValueError('a position record has %d bytes ending in w or y' % RECORD_SIZE)
+    return BitBoard.decode(data[:SQUARES]), WHITE if data[-1:] == b'w' else YELLOW
+
+
+def read_positions(file, binary=False):
+    if binary:
+        while True:
+            record = file.read(RECORD_SIZE)
+            if not record:
+                return
+            yield record
+    else:
+        for line in file:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def parse_position(record):
+    if isinstance(record, bytes):
+        return decode_position(record)
+    return parse_fen(record)
+
+
+"""
+
+multipv(position, color, depth, lines, searcher): Function that returns the
+best lines moves of color in position, searched to depth, as a list of
+(score, pv) best first, where pv is the list of BitBoard moves starting with
+the move. It returns [] when color has no move. position is searched in
+place and restored. searcher is an AlphaBeta with a TranspositionTable,
+which is needed for the principal variations; a new one is used if not
+given. depth and lines must be at least 1, or it raises a ValueError.
+
+"""
+
+def multipv(position, color, depth, lines=3, searcher=None):
+    _check(depth, lines)
+    if searcher is None:
+        searcher = AlphaBeta(TranspositionTable(1 << 16))
+    max_player = color == WHITE
+    other = YELLOW if max_player else WHITE
+    best = []
+    nodes = 0
+    for move in searcher.order_moves(position, position.get_all_moves(color), 0):
+        full = len(best) < lines
+        if full:
+            alpha, beta = float('-inf'), float('inf')
+        elif max_player:
+            alpha, beta = best[-1][0], float('inf')
+        else:
+            alpha, beta = float('-inf'), best[-1][0]
+
+        undo = position.make_move(move)
+        score = searcher.score(position, depth - 1, not max_player, alpha, beta)
+        nodes += searcher.nodes
+        if full or (score > alpha if max_player else score < beta):
+            pv = [move] + principal_variation(searcher.table, position, other, depth - 1)
+            best.append((score, pv))
+            best.sort(key=lambda line: -line[0] if max_player else line[0])
+            del best[lines:]
+        position.unmake_move(undo)
+    searcher.nodes = nodes
+    return best
+
+
+"""
+
+principal_variation(table, board, color, depth): Function that returns up
+to depth moves following the best moves the transposition table holds from
+board, color to move. board is restored.
+
+"""
+
+def principal_variation(table, board, color, depth):
+    if table is None:
+        return []
+    pv, undos = [], []
+    while len(pv) < depth:
+        entry = table.probe(position_key(board, color))
+        if entry is None or entry[4] is None:
+            break
+        move = None
+        for candidate in board.get_all_moves(color):
+            if (candidate[0], candidate[1]) == entry[4]:
+                move = candidate
+                break
+        if move is None:
+            break
+        undos.append(board.make_move(move))
+        pv.append(move)
+        color = YELLOW if color == WHITE else WHITE
+    for undo in reversed(undos):
+        board.unmake_move(undo)
+    return pv
+
+
+_searcher = None
+
+
+"""
+
+analyse_chunk(first, records, depth, lines): Function run in a worker
+process that analyses a chunk of records, the first one being position
+number first, and returns their JSON results. Each worker keeps one
+searcher and transposition table for all its chunks.
+
+"""
+
+def analyse_chunk(first, records, depth, lines):
+    global _searcher
+    if _searcher is None:
+        _searcher = AlphaBeta(TranspositionTable(1 << 18))
+    results = []
+    for number, record in enumerate(records, first):
+        try:
+            board, color = parse_position(record)
+        except ValueError as error:
+            results.append({'position': number, 'error': str(error)})
+            continue
+        best = multipv(board, color, depth, lines, _searcher)
+        results.append({'position': number, 'fen': fen_of(board, color), 'depth': depth,
+                        'nodes': _searcher.nodes,
+                        'lines': [{'move': move_text(pv[0]), 'score': _json_number(score),
+                                   'pv': [move_text(move) for move in pv]} for score, pv in best]})
+    return results
+
+
+def _json_number(score):
+    if math.isfinite(score):
+        return round(score, 3)
+    return '+inf' if score > 0 else '-inf'
+
+
+class MultiPVSummary:
+    def __init__(self):
+        self.positions = 0
+        self.errors = 0
+        self.nodes = 0
+
+    def report(self):
+        return '%d positions, %d errors, %d nodes' % (self.positions, self.errors, self.nodes)
+
+
+"""
+
+run_multipv(records, depth, lines, workers, output, chunk_size, progress):
+Function that analyses an iterable of records (such as read_positions over
+an open file) over a pool of workers. Each result is written to the output
+file object as one JSON line, in input order, as soon as it and the ones
+before it are ready. progress, if given, is called with the MultiPVSummary
+after every chunk. It returns the MultiPVSummary. Like multipv, it raises
+a ValueError for a depth or lines below 1, before starting the workers.
+
+"""
+
+def run_multipv(records, depth, lines=3, workers=None, output=None, chunk_size=CHUNK_SIZE, progress=None):
+    _check(depth, lines)
+    summary = MultiPVSummary()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunk, first = [], 0
+        for number, record in enumerate(records):
+            chunk.append(record)
+            if len(chunk) < chunk_size:
+                continue
+            pending.append(executor.submit(analyse_chunk, first, chunk, depth, lines))
+            chunk, first = [], number + 1
+            if len(pending) >= 2 * workers:
+                _write(pending.popleft().result(), summary, output, progress)
+        if chunk:
+            pending.append(executor.submit(analyse_chunk, first, chunk, depth, lines))
+        while pending:
+            _write(pending.popleft().result(), summary, output, progress)
+    return summary
+
+
+def _check(depth, lines):
+    if depth < 1 or lines < 1:
+        raise ValueError('the depth and the number of lines must be at least 1')
+
+
+def _write(results, summary, output, progress):
+    for result in results:
+        summary.positions += 1
+        summary.errors += 'error' in result
+        summary.nodes += result.get('nodes', 0)
+        if output is not None:
+            output.write(json.dumps(result, separators=(',', ':')) + '\n')
+    if output is not None:
+        output.flush()
+    if progress is not None:
+        progress(summary)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Find the best moves and lines of many positions.')
+    parser.add_argument('positions', help='file of FEN lines, or of binary records with --binary')
+    parser.add_argument('--binary', action='store_true', help='read %d-byte position records' % RECORD_SIZE)
+    parser.add_argument('--depth', type=int, default=6)
+    parser.add_argument('--lines', type=int, default=3, help='moves to report per position')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='positions per worker task')
+    parser.add_argument('--output', help='file the results are written to (default: standard output)')
+    args = parser.parse_args()
+    if args.depth < 1 or args.lines < 1 or args.chunk_size < 1:
+        parser.error('the depth, lines and chunk size must be at least 1')
+
+    def progress(summary):
+        if summary.positions % (100 * args.chunk_size) < args.chunk_size:
+            print(summary.report(), file=sys.stderr)
+
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        with open(args.positions, 'rb' if args.binary else 'r') as positions:
+            summary = run_multipv(read_positions(positions, args.binary), args.depth, args.lines, args.workers,
+                                  output, args.chunk_size, progress)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(summary.report(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
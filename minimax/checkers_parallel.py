@@ -0,0 +1,206 @@
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from checkers.checkers_bitboard import BitBoard, convert_move
+from checkers.checkers_constant import YELLOW, WHITE
+from .checkers_algorithm import minimax_algorithm
+from .checkers_alphabeta import AlphaBeta
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Parallel search that spreads the root moves of a position over a pool of
+worker processes (root splitting).
+
+The root moves are ordered like in AlphaBeta and handed out in that order.
+Each task gets the position as BitBoard.pack() plus the move to search, so
+nothing but a handful of ints is pickled. All workers share the best root
+score found so far through shared memory and use it as their alpha-beta
+bound, so moves searched after a good one are refuted quickly, as in a
+sequential search. Each worker process keeps its own AlphaBeta searcher
+and TranspositionTable for its whole life.
+
+The result is the same (score, board) as minimax_algorithm.
+
+Run the module to compare it with the single-process searches on a fixed
+set of positions:
+
+    python -m minimax.checkers_parallel --depth 6 --workers 16
+
+"""
+
+class ParallelSearch:
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self._bound = multiprocessing.Value('d', 0.0)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(self._bound,))
+        self.nodes = 0
+
+    """
+
+    search(self, position, depth, max_player): Method that searches position to
+    depth with the root moves split across the workers and returns
+    (score, board) like minimax_algorithm. nodes holds the total number of
+    nodes the workers searched.
+
+    """
+
+    def search(self, position, depth, max_player):
+        if depth == 0 or position.winner() != None:
+            return position.evaluate(), position
+
+        board = position if isinstance(position, BitBoard) else BitBoard.from_board(position)
+        moves = AlphaBeta().order_moves(board, board.get_all_moves(WHITE if max_player else YELLOW), 0)
+        if not moves:
+            return (float('-inf') if max_player else float('inf')), None
+
+        with self._bound.get_lock():
+            self._bound.value = float('-inf') if max_player else float('inf')
+        packed = board.pack()
+        futures = [self._executor.submit(_search_move, packed, move, depth, max_player) for move in moves]
+
+        self.nodes = 0
+        best_score = best_move = None
+        for move, future in zip(moves, futures):
+            score, bound, nodes = future.result()
+            self.nodes += nodes
+            # A move that did not beat the bound it was searched with only
+            # has a bound for its score, and a move that set that bound
+            # scores at least as well, so only exact scores are compared.
+            if not _exact(score, bound, max_player):
+                continue
+            if best_move is None or (score > best_score if max_player else score < best_score):
+                best_score, best_move = score, move
+
+        return best_score, position.apply_move(convert_move(position, best_move, WHITE if max_player else YELLOW))
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_bound = None
+_searcher = None
+
+
+def _init_worker(bound):
+    global _bound, _searcher
+    _bound = bound
+    _searcher = AlphaBeta(TranspositionTable())
+
+
+"""
+
+_search_move(packed, move, depth, max_player): Function run in a worker. It
+plays move on the packed position and searches the rest of the tree with
+the shared best score as bound, then tightens the bound with its result.
+It returns (score, bound, nodes), bound being the bound it searched with;
+a score that does not beat it is only an upper (or, for the min player,
+lower) bound on the score of the move.
+
+"""
+
+def _search_move(packed, move, depth, max_player):
+    board = BitBoard.unpack(packed)
+    board.make_move(move)
+    bound = _bound.value
+    if max_player:
+        score = _searcher.score(board, depth - 1, False, bound, float('inf'))
+    else:
+        score = _searcher.score(board, depth - 1, True, float('-inf'), bound)
+
+    with _bound.get_lock():
+        if (score > _bound.value) if max_player else (score < _bound.value):
+            _bound.value = score
+    return score, bound, _searcher.nodes
+
+
+def _exact(score, bound, max_player):
+    if max_player:
+        return score > bound or bound == float('-inf')
+    return score < bound or bound == float('inf')
+
+
+"""
+
+benchmark_positions(count, seed): Function that returns a fixed, reproducible
+set of (board, max_player) positions reached by random play from the start.
+
+benchmark(positions, depth, workers): Function that searches every position
+with minimax_algorithm, with a single-process AlphaBeta and with a
+ParallelSearch, checks that the scores agree and that the move the
+parallel search chose really has its score, and returns a list of
+per-position rows (minimax_s, alpha_beta_s, parallel_s) plus the totals.
+
+"""
+
+def benchmark_positions(count=8, seed=1):
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, turn = BitBoard(), YELLOW
+        for _ in range(rng.randrange(4, 30)):
+            moves = board.get_all_moves(turn)
+            if not moves or board.winner() != None:
+                break
+            board = board.apply_move(rng.choice(moves))
+            turn = WHITE if turn == YELLOW else YELLOW
+        if board.winner() == None and board.get_all_moves(turn):
+            positions.append((board, turn == WHITE))
+    return positions
+
+
+def benchmark(positions, depth, workers=None):
+    rows = []
+    with ParallelSearch(workers) as parallel:
+        for board, max_player in positions:
+            start = time.perf_counter()
+            expected = minimax_algorithm(board.copy(), depth, max_player, None)[0]
+            minimax_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            sequential = AlphaBeta(TranspositionTable()).search(board.copy(), depth, max_player)[0]
+            sequential_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            score, child = parallel.search(board, depth, max_player)
+            parallel_time = time.perf_counter() - start
+
+            if not expected == sequential == score:
+                raise AssertionError('search scores disagree: %r %r %r' % (expected, sequential, score))
+            chosen = AlphaBeta().score(child.copy(), depth - 1, not max_player)
+            if chosen != score:
+                raise AssertionError('the chosen move scores %r, not %r' % (chosen, score))
+            rows.append((minimax_time, sequential_time, parallel_time))
+    totals = tuple(sum(column) for column in zip(*rows))
+    return rows, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the parallel search with minimax_algorithm.')
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--positions', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rows, totals = benchmark(benchmark_positions(args.positions, args.seed), args.depth, args.workers)
+    print('position  minimax_s  alphabeta_s  parallel_s')
+    for index, (minimax_time, sequential_time, parallel_time) in enumerate(rows):
+        print('%8d  %9.3f  %11.3f  %10.3f' % (index, minimax_time, sequential_time, parallel_time))
+    print('%8s  %9.3f  %11.3f  %10.3f' % (('total',) + totals))
+    print('speedup vs minimax_algorithm: %.1fx, vs single-process alpha-beta: %.1fx (%d workers)'
+          % (totals[0] / totals[2], totals[1] / totals[2], args.workers))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import time
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_game import Game
+from checkers.checkers_pdn import parse_move, move_text, fen_of
+from checkers.checkers_squares import row_col
+from .checkers_alphabeta import AlphaBeta
+from .checkers_iterative import iterative_deepening
+from .checkers_transposition import TranspositionTable
+from .checkers_worker import find_move
+
+
+"""
+Game server for many concurrent games. One asyncio process holds every
+game as a headless Game (win=None) over a BitBoard, and sends the AI moves
+of all of them to one shared pool of worker processes.
+
+Clients connect to a local TCP socket and send one JSON object per line.
+Each request gets one JSON line back, in order, echoing its "id" when it
+has one:
+
+    {"id": 1, "op": "new"}
+        -> {"id": 1, "ok": true, "game": 7, "turn": "yellow", "fen": "B:W21,...", "moves": ["9-13", ...], ...}
+    {"id": 2, "op": "move", "game": 7, "move": "11-15"}
+    {"id": 3, "op": "ai", "game": 7, "time_ms": 200}
+        -> {..., "played": "24-19", "score": 0.05, "depth": 6, "latency_ms": 212.4}
+    {"id": 4, "op": "state", "game": 7}
+    {"id": 5, "op": "close", "game": 7}
+    {"id": 6, "op": "stats"}
+    -> {"ok": false, "error": "..."} when a request fails.
+
+Moves are in PDN notation and positions in PDN FEN (see checkers_pdn).
+YELLOW moves first, as in Game. Game states list the legal moves, the moves
+played and the winner, if any.
+
+time_ms is the latency budget of an AI request: the time it waited for a
+worker is taken off its search time (never below MIN_SEARCH_MS), so a
+request answers within its budget as long as it waits less than that. At
+most workers searches run at once; the others wait in line. max_queue
+bounds the line, and with it the wait: when that many requests are already
+waiting, new AI requests are refused at once with "busy", and clients
+should back off and retry. "stats" reports the sessions,
+the queue depth, the running searches and the percentiles of the latency
+of the last LATENCY_SAMPLES AI requests.
+
+    python -m minimax.checkers_server --port 8765 --workers 8
+    python -m minimax.checkers_load --port 8765 --clients 200 --games 1000
+
+"""
+
+MIN_SEARCH_MS = 10
+LATENCY_SAMPLES = 10000
+COLORS = {WHITE: 'white', YELLOW: 'yellow'}
+OPS = ('new', 'move', 'ai', 'state', 'close', 'stats')
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class Session:
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.game = Game(None, BitBoard)
+        self.busy = False
+
+
+"""
+
+state(session): Function that returns the JSON fields describing a game:
+its FEN, side to move, legal moves, moves played and winner (see
+Game.winner).
+
+"""
+
+def state(session):
+    game = session.game
+    moves = game.board.get_all_moves(game.turn)
+    winner = game.winner()
+    return {'game': session.game_id, 'turn': COLORS[game.turn], 'fen': fen_of(game.board, game.turn),
+            'moves': [move_text(move) for move in moves] if winner is None else [],
+            'played': [move_text(move) for move in game.history],
+            'winner': COLORS.get(winner)}
+
+
+class EngineServer:
+    def __init__(self, workers=None, max_queue=256, max_time_ms=5000, max_sessions=100000):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_time_ms = max_time_ms
+        self.max_sessions = max_sessions
+        self.sessions = {}
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._ids = itertools.count(1)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+
+    """
+
+    serve(self, host, port): Coroutine that accepts clients until cancelled.
+    The port actually bound is kept in port (useful with port 0).
+
+    handle(self, reader, writer): Coroutine that serves one client connection.
+
+    request(self, message): Coroutine that runs one decoded request and
+    returns its response fields. Bad requests raise ValueError, refused AI
+    requests ServerBusy.
+
+    """
+
+    async def serve(self, host='127.0.0.1', port=8765, ready=None):
+        server = await asyncio.start_server(self.handle, host, port)
+        self.port = server.sockets[0].getsockname()[1]
+        if ready is not None:
+            ready(self)
+        async with server:
+            await server.serve_forever()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = {}
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError('a request is a JSON object')
+                    if 'id' in message:
+                        response['id'] = message['id']
+                    response.update(await self.request(message))
+                    response['ok'] = True
+                except ServerBusy:
+                    response.update(ok=False, error='busy')
+                except (ValueError, KeyError, TypeError) as error:
+                    response.update(ok=False, error=str(error))
+                writer.write(json.dumps(response, separators=(',', ':')).encode() + b'\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def request(self, message):
+        op = message.get('op')
+        if op not in OPS:
+            raise ValueError('unknown op %r' % op)
+        if op == 'new':
+            if len(self.sessions) >= self.max_sessions:
+                raise ValueError('too many games')
+            session = Session(next(self._ids))
+            self.sessions[session.game_id] = session
+            return state(session)
+        if op == 'stats':
+            return self.stats()
+
+        session = self.sessions.get(message.get('game'))
+        if session is None:
+            raise ValueError('no game %r' % message.get('game'))
+        if op == 'state':
+            return state(session)
+        if session.busy:
+            raise ValueError('game %d is waiting for an AI move' % session.game_id)
+        if op == 'move':
+            game = session.game
+            move = parse_move(game.board, game.turn, str(message['move']))
+            game.apply_move(row_col(move[0]), row_col(move[1]))
+            return state(session)
+        if op == 'ai':
+            return await self.ai_move(session, message.get('time_ms', 1000))
+        del self.sessions[session.game_id]
+        return {'game': session.game_id}
+
+    """
+
+    ai_move(self, session, time_ms): Coroutine that plays the AI move of the
+    side to move in a session within a latency budget of time_ms.
+
+    """
+
+    async def ai_move(self, session, time_ms):
+        time_ms = min(float(time_ms), self.max_time_ms)
+        game = session.game
+        if game.winner() is not None:
+            raise ValueError('game %d is over' % session.game_id)
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise ServerBusy()
+
+        start = time.perf_counter()
+        session.busy = True
+        self.waiting += 1
+        queued = True
+        try:
+            async with self._slots:
+                self.waiting -= 1
+                queued = False
+                search_ms = max(time_ms - 1000 * (time.perf_counter() - start), MIN_SEARCH_MS)
+                self.running += 1
+                try:
+                    score, move, depth = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, _search, game.board.pack(), game.turn == WHITE, search_ms)
+                finally:
+                    self.running -= 1
+        finally:
+            if queued:
+                self.waiting -= 1
+            session.busy = False
+
+        if move is None:
+            raise ValueError('no legal move for game %d' % session.game_id)
+        game.apply_move(*move)
+        latency_ms = 1000 * (time.perf_counter() - start)
+        self.latencies.append(latency_ms)
+        self.completed += 1
+        response = state(session)
+        if not math.isfinite(score):
+            score = '+inf' if score > 0 else '-inf'
+        response.update(played=move_text(game.history[-1]), score=score, depth=depth,
+                        latency_ms=round(latency_ms, 1))
+        return response
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        return {'sessions': len(self.sessions), 'workers': self.workers, 'queue': self.waiting,
+                'running': self.running, 'completed': self.completed, 'rejected': self.rejected,
+                'latency_ms': {name: round(percentile(latencies, share), 1)
+                               for name, share in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))}}
+
+    def close(self):
+        self._executor.shutdown(cancel_futures=True)
+
+
+"""
+
+percentile(values, share): Function that returns the share-th quantile of a
+sorted list (nearest rank), or 0 for an empty list.
+
+"""
+
+def percentile(values, share):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(share * len(values))) - 1))]
+
+
+_searcher = None
+
+
+"""
+
+_search(packed, max_player, time_ms): Function run in a worker process that
+searches a packed position for time_ms milliseconds and returns
+(score, move, depth), move as ((from_row, from_col), (to_row, to_col)).
+Each worker keeps one searcher and transposition table for all the games
+it is given.
+
+"""
+
+def _search(packed, max_player, time_ms):
+    global _searcher
+    if _searcher is None:
+        _searcher = AlphaBeta(TranspositionTable(1 << 18))
+    position = BitBoard.unpack(packed)
+    score, board, depth = iterative_deepening(position, max_player, None, time_ms, searcher=_searcher)
+    return score, find_move(position, board, WHITE if max_player else YELLOW), depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve many checkers games over line-delimited JSON.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-queue', type=int, default=256, help='AI requests allowed to wait')
+    parser.add_argument('--max-time-ms', type=int, default=5000, help='largest AI time budget')
+    parser.add_argument('--max-sessions', type=int, default=100000)
+    args = parser.parse_args()
+
+    async def run():
+        server = EngineServer(args.workers, args.max_queue, args.max_time_ms, args.max_sessions)
+        try:
+            await server.serve(args.host, args.port,
+                               lambda server: print('serving on %s:%d' % (args.host, server.port), flush=True))
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
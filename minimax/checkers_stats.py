@@ -0,0 +1,242 @@
+import time
+
+
+"""
+Opt-in statistics for the searches. A SearchStats object passed to
+minimax_algorithm, AlphaBeta or iterative_deepening is filled in while they
+search and tells where the time of a move went:
+
+* nodes_by_ply: positions expanded (moves generated) at every ply.
+* leaves: positions scored with the evaluation.
+* move_time, evaluation_time, copy_time: seconds spent generating moves,
+  evaluating leaves and playing/taking back/copying moves. The rest of
+  elapsed is the search itself (ordering, tables, recursion).
+* cutoffs and table_hits/table_probes, for AlphaBeta.
+* iterations: (depth, nodes, leaves, seconds) for every iteration of
+  iterative_deepening that finished.
+
+The search reaches the board through wrap(board), an object that forwards
+to the board and times the calls. Without a SearchStats the search calls
+the board directly, so statistics cost nothing unless asked for.
+
+A callback, if given, is called with the SearchStats every CALLBACK_NODES
+expanded nodes, after every iteration and when a search ends, for live
+progress. report() formats everything for a log.
+
+"""
+
+class SearchStats:
+    CALLBACK_NODES = 4096
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        self.reset()
+
+    """
+
+    reset(self): Method that clears every counter and restarts the clock.
+
+    begin(self, searcher), end(self, searcher): Methods the searches call
+    around each search to collect the searcher's cutoff and transposition
+    table counters; searcher may be None.
+
+    iteration(self, depth): Method iterative_deepening calls after each
+    finished iteration.
+
+    """
+
+    def reset(self):
+        self.nodes_by_ply = []
+        self.leaves = 0
+        self.move_time = self.evaluation_time = self.copy_time = 0.0
+        self.cutoffs = 0
+        self.table_probes = self.table_hits = 0
+        self.iterations = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self._ply = 0
+        self._count = 0
+        self._mark = (0, 0, self.started)
+
+    def begin(self, searcher=None):
+        self._ply = 0
+        self._searcher_start = _searcher_counters(searcher)
+
+    def end(self, searcher=None):
+        cutoffs, probes, hits = _searcher_counters(searcher)
+        self.cutoffs += cutoffs - self._searcher_start[0]
+        self.table_probes += probes - self._searcher_start[1]
+        self.table_hits += hits - self._searcher_start[2]
+        self.elapsed = time.perf_counter() - self.started
+        if self.callback is not None:
+            self.callback(self)
+
+    def iteration(self, depth):
+        nodes, leaves, start = self._mark
+        now = time.perf_counter()
+        self.iterations.append((depth, self.nodes - nodes, self.leaves - leaves, now - start))
+        self._mark = (self.nodes, self.leaves, now)
+        if self.callback is not None:
+            self.callback(self)
+
+    """
+
+    nodes: total number of expanded nodes.
+
+    nodes_per_second(self): nodes and leaves visited per second.
+
+    branching_factor(self): effective branching factor: the nodes of the
+    last iteration divided by the nodes of the one before it, or for a
+    single search the depth-th root of the nodes and leaves it visited.
+
+    cutoff_rate(self): share of the expanded nodes that ended in a cutoff.
+
+    table_hit_rate(self): share of the table probes that found an entry.
+
+    """
+
+    @property
+    def nodes(self):
+        return sum(self.nodes_by_ply)
+
+    def nodes_per_second(self):
+        return (self.nodes + self.leaves) / self.elapsed if self.elapsed else 0.0
+
+    def branching_factor(self):
+        if len(self.iterations) >= 2 and self.iterations[-2][1]:
+            return self.iterations[-1][1] / self.iterations[-2][1]
+        depth = len(self.nodes_by_ply)
+        return (self.nodes + self.leaves) ** (1 / depth) if depth else 0.0
+
+    def cutoff_rate(self):
+        return self.cutoffs / self.nodes if self.nodes else 0.0
+
+    def table_hit_rate(self):
+        return self.table_hits / self.table_probes if self.table_probes else 0.0
+
+    def as_dict(self):
+        return {
+            'nodes': self.nodes,
+            'nodes_by_ply': list(self.nodes_by_ply),
+            'leaves': self.leaves,
+            'elapsed': self.elapsed,
+            'move_time': self.move_time,
+            'evaluation_time': self.evaluation_time,
+            'copy_time': self.copy_time,
+            'nodes_per_second': self.nodes_per_second(),
+            'branching_factor': self.branching_factor(),
+            'cutoffs': self.cutoffs,
+            'cutoff_rate': self.cutoff_rate(),
+            'table_probes': self.table_probes,
+            'table_hit_rate': self.table_hit_rate(),
+            'iterations': list(self.iterations),
+        }
+
+    def report(self):
+        other = self.elapsed - self.move_time - self.evaluation_time - self.copy_time
+        lines = ['%d nodes, %d leaves in %.3f s (%.0f nodes/s), branching factor %.2f'
+                 % (self.nodes, self.leaves, self.elapsed, self.nodes_per_second(), self.branching_factor()),
+                 'time: moves %.3f s, evaluation %.3f s, copy %.3f s, search %.3f s'
+                 % (self.move_time, self.evaluation_time, self.copy_time, other),
+                 'nodes by ply: %s' % ' '.join(str(count) for count in self.nodes_by_ply)]
+        if self.cutoffs or self.table_probes:
+            lines.append('cutoffs %.1f%%, table hits %.1f%% of %d probes'
+                         % (100 * self.cutoff_rate(), 100 * self.table_hit_rate(), self.table_probes))
+        for depth, nodes, leaves, seconds in self.iterations:
+            lines.append('depth %2d: %d nodes, %d leaves, %.3f s' % (depth, nodes, leaves, seconds))
+        return '\n'.join(lines)
+
+    """
+
+    wrap(self, board, evaluate): Method that returns a TimedBoard over board.
+    Its evaluate() calls evaluate(board) when evaluate is given.
+
+    time_batch(self, batch_evaluate, masks): Method that runs a batched leaf
+    evaluation (see AlphaBeta.batch_evaluate) and counts it.
+
+    """
+
+    def wrap(self, board, evaluate=None):
+        return TimedBoard(board, self, evaluate)
+
+    def time_batch(self, batch_evaluate, masks):
+        start = time.perf_counter()
+        scores = batch_evaluate(masks)
+        self.evaluation_time += time.perf_counter() - start
+        self.leaves += len(masks)
+        return scores
+
+    def _expanded(self):
+        ply = self._ply
+        while len(self.nodes_by_ply) <= ply:
+            self.nodes_by_ply.append(0)
+        self.nodes_by_ply[ply] += 1
+        self._count += 1
+        if self.callback is not None and not self._count % self.CALLBACK_NODES:
+            self.elapsed = time.perf_counter() - self.started
+            self.callback(self)
+
+
+def _searcher_counters(searcher):
+    if searcher is None:
+        return 0, 0, 0
+    table = getattr(searcher, 'table', None)
+    if table is None:
+        return searcher.cutoffs, 0, 0
+    return searcher.cutoffs, table.hits + table.misses, table.hits
+
+
+"""
+
+TimedBoard forwards every attribute to the board it wraps and times the
+calls a search makes: get_all_moves, evaluate, make_move, unmake_move and
+apply_move. It follows the ply from make_move/unmake_move to count nodes
+per ply. unwrap(board) returns the board a TimedBoard wraps, or board.
+
+"""
+
+class TimedBoard:
+    def __init__(self, board, stats, evaluate=None):
+        self._board = board
+        self._stats = stats
+        self._evaluate = evaluate
+
+    def __getattr__(self, name):
+        return getattr(self._board, name)
+
+    def get_all_moves(self, color):
+        start = time.perf_counter()
+        moves = self._board.get_all_moves(color)
+        self._stats.move_time += time.perf_counter() - start
+        self._stats._expanded()
+        return moves
+
+    def evaluate(self):
+        start = time.perf_counter()
+        score = self._board.evaluate() if self._evaluate is None else self._evaluate(self._board)
+        self._stats.evaluation_time += time.perf_counter() - start
+        self._stats.leaves += 1
+        return score
+
+    def make_move(self, move):
+        start = time.perf_counter()
+        undo = self._board.make_move(move)
+        self._stats.copy_time += time.perf_counter() - start
+        self._stats._ply += 1
+        return undo
+
+    def unmake_move(self, undo):
+        start = time.perf_counter()
+        self._board.unmake_move(undo)
+        self._stats.copy_time += time.perf_counter() - start
+        self._stats._ply -= 1
+
+    def apply_move(self, move):
+        start = time.perf_counter()
+        board = self._board.apply_move(move)
+        self._stats.copy_time += time.perf_counter() - start
+        return board
+
+
+def unwrap(board):
+    return board._board if isinstance(board, TimedBoard) else board
@@ -0,0 +1,383 @@
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from math import comb
+import argparse
+import mmap
+import os
+import struct
+import sys
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_squares import (SQUARES, NEIGHBOR, UP_DIRECTIONS, DOWN_DIRECTIONS, DIRECTIONS,
+                                       TOP_ROW, BOTTOM_ROW, iter_bits)
+
+
+"""
+Endgame tablebase for positions with few pieces. For every position with up
+to N pieces it stores whether the side to move wins, loses or draws with
+best play, and in how many plies the game ends. The search can then score
+such positions exactly instead of shuffling kings around to its horizon.
+
+Positions are grouped by material signature (white men, white kings,
+yellow men, yellow kings). Each signature has its own file:
+
+    header   16 bytes: MAGIC, the four signature counts, 4 bytes padding
+    values   one little-endian uint16 per index
+
+Indexing is perfect over piece placements: the white men, white kings,
+yellow men and yellow kings are placed in that order, each group as a
+combination of the squares the previous groups left free, and the rank of
+each combination is combined in a mixed radix; the last bit is the side to
+move. Placements with a man on its own crowning row can not happen in a
+game; their slots are stored as draws and never probed.
+
+A value is 0 for a draw, 2 * d + 1 for a win in d plies and 2 * d + 2 for a
+loss in d plies, seen from the side to move. A side without a legal move
+has lost.
+
+Generation is retrograde. A signature only depends on signatures with fewer
+pieces (captures) or fewer men (crowning), so signatures are solved level
+by level, the signatures of one level in parallel processes. Inside a
+signature, results are propagated backwards from the decided positions
+through un-moves in order of distance. Every finished signature is written
+to its own file (through a temporary name), so an interrupted run resumes
+where it stopped.
+
+    python -m minimax.checkers_tablebase --pieces 4 --output tablebase --workers 16
+
+"""
+
+MAGIC = b'CKRTB001'
+HEADER = struct.Struct('<8s4B4x')
+DRAW, WIN, LOSS = 0, 1, 2
+WIN_SCORE = 1000
+
+
+def signature_of(board):
+    men = ~board.kings
+    return (bin(board.white & men).count('1'), bin(board.white & board.kings).count('1'),
+            bin(board.yellow & men).count('1'), bin(board.yellow & board.kings).count('1'))
+
+
+def signature_size(signature):
+    size, free = 2, SQUARES
+    for count in signature:
+        size *= comb(free, count)
+        free -= count
+    return size
+
+
+def file_name(signature):
+    return '%d%d%d%d.cktb' % signature
+
+
+"""
+
+encode(signature, white, yellow, kings, white_to_move): Function that returns
+the index of a position in the table of its signature.
+
+decode(signature, index): Function that returns (white, yellow, kings,
+white_to_move) for an index.
+
+"""
+
+def encode(signature, white, yellow, kings, white_to_move):
+    index = 0
+    occupied = 0
+    free = SQUARES
+    for count, mask in zip(signature, (white & ~kings, white & kings, yellow & ~kings, yellow & kings)):
+        rank = 0
+        for i, sq in enumerate(iter_bits(mask)):
+            position = sq - bin(occupied & ((1 << sq) - 1)).count('1')
+            rank += comb(position, i + 1)
+        index = index * comb(free, count) + rank
+        occupied |= mask
+        free -= count
+    return index * 2 + (1 if white_to_move else 0)
+
+
+def decode(signature, index):
+    white_to_move = bool(index & 1)
+    index >>= 1
+    radices = []
+    free = SQUARES
+    for count in signature:
+        radices.append(comb(free, count))
+        free -= count
+    ranks = []
+    for radix in reversed(radices):
+        ranks.append(index % radix)
+        index //= radix
+    ranks.reverse()
+
+    masks = []
+    occupied = 0
+    for count, rank in zip(signature, ranks):
+        free_squares = [sq for sq in range(SQUARES) if not occupied & (1 << sq)]
+        mask = 0
+        for i in range(count, 0, -1):
+            position = i - 1
+            while comb(position + 1, i) <= rank:
+                position += 1
+            rank -= comb(position, i)
+            mask |= 1 << free_squares[position]
+        masks.append(mask)
+        occupied |= mask
+    white_men, white_kings, yellow_men, yellow_kings = masks
+    return white_men | white_kings, yellow_men | yellow_kings, white_kings | yellow_kings, white_to_move
+
+
+def _board(white, yellow, kings):
+    board = BitBoard.__new__(BitBoard)
+    board.white, board.yellow, board.kings = white, yellow, kings
+    board.white_left = bin(white).count('1')
+    board.red_left = bin(yellow).count('1')
+    board.white_kings = board.red_kings = 0
+    board.zobrist = board.evaluation = 0
+    return board
+
+
+def _valid(white, yellow, kings):
+    return not (white & ~kings & BOTTOM_ROW) and not (yellow & ~kings & TOP_ROW)
+
+
+class Tablebase:
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self.signatures = set()
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            if name.endswith('.cktb') and len(name) == 9 and name[:4].isdigit():
+                self.signatures.add(tuple(int(digit) for digit in name[:4]))
+        self.max_pieces = max((sum(signature) for signature in self.signatures), default=0)
+
+    """
+
+    probe(self, board, color): Method that returns (result, distance) for board
+    with color to move, result being WIN, LOSS or DRAW for that side, or
+    None when the position is not covered by the tablebase.
+
+    score(self, board, color): Method that returns the probe result as a score
+    from WHITE's point of view like Board.evaluate, or None: wins and losses
+    are worth WIN_SCORE minus the distance, so quicker wins score higher.
+
+    """
+
+    def probe(self, board, color):
+        if not isinstance(board, BitBoard):
+            board = BitBoard.from_board(board)
+        if not board.white or not board.yellow:
+            return (LOSS, 0) if not (board.white if color == WHITE else board.yellow) else (WIN, 0)
+        signature = signature_of(board)
+        values = self._values(signature)
+        if values is None:
+            return None
+        return _result(values[encode(signature, board.white, board.yellow, board.kings, color == WHITE)])
+
+    def score(self, board, color):
+        result = self.probe(board, color)
+        if result is None:
+            return None
+        value, distance = result
+        if value == DRAW:
+            return 0
+        score = WIN_SCORE - distance if value == WIN else distance - WIN_SCORE
+        return score if color == WHITE else -score
+
+    def _values(self, signature):
+        if signature not in self._tables:
+            if signature not in self.signatures:
+                return None
+            self._tables[signature] = _open_table(os.path.join(self.directory, file_name(signature)))
+        return self._tables[signature]
+
+
+def _open_table(path):
+    with open(path, 'rb') as table_file:
+        data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:8] != MAGIC:
+        raise ValueError('%s is not a tablebase file' % path)
+    if sys.byteorder == 'big':
+        values = array('H', data[HEADER.size:])
+        values.byteswap()
+        return values
+    return memoryview(data)[HEADER.size:].cast('H')
+
+
+def _result(value):
+    if value == 0:
+        return DRAW, 0
+    if value & 1:
+        return WIN, (value - 1) // 2
+    return LOSS, (value - 2) // 2
+
+
+def _encode_value(result, distance):
+    return 2 * distance + (1 if result == WIN else 2)
+
+
+"""
+
+signatures(max_pieces): Function that returns all signatures with both sides
+on the board and at most max_pieces pieces, grouped in levels that can be
+solved in parallel, in the order they have to be solved.
+
+"""
+
+def signatures(max_pieces):
+    levels = {}
+    for total in range(2, max_pieces + 1):
+        for white in range(1, total):
+            for white_men in range(white + 1):
+                for yellow_men in range(total - white + 1):
+                    signature = (white_men, white - white_men, yellow_men, total - white - yellow_men)
+                    levels.setdefault((total, white_men + yellow_men), []).append(signature)
+    return [levels[level] for level in sorted(levels)]
+
+
+"""
+
+solve(signature, directory): Function that computes the table of one
+signature, using the already solved smaller signatures in directory, and
+writes it there. It does nothing if the file already exists.
+
+"""
+
+def solve(signature, directory):
+    path = os.path.join(directory, file_name(signature))
+    if os.path.exists(path):
+        return False
+
+    tablebase = Tablebase(directory)
+    size = signature_size(signature)
+    values = array('H', bytes(2 * size))
+    pending = array('H', bytes(2 * size))
+    longest = array('H', bytes(2 * size))
+    # 1: decided or invalid, 2: has an exit that draws or wins
+    flags = bytearray(size)
+    buckets = {}
+
+    for index in range(size):
+        white, yellow, kings, white_to_move = decode(signature, index)
+        if not _valid(white, yellow, kings):
+            flags[index] = 1
+            continue
+        board = _board(white, yellow, kings)
+        color = WHITE if white_to_move else YELLOW
+        other = YELLOW if white_to_move else WHITE
+        moves = board.get_all_moves(color)
+        if not moves:
+            buckets.setdefault(0, []).append((index, LOSS))
+            continue
+
+        inside = 0
+        win = None
+        for move in moves:
+            if not move[2] and not board.is_promotion(move):
+                inside += 1
+                continue
+            undo = board.make_move(move)
+            result, distance = tablebase.probe(board, other)
+            board.unmake_move(undo)
+            if result == LOSS:
+                win = distance + 1 if win is None else min(win, distance + 1)
+            elif result == WIN:
+                longest[index] = max(longest[index], distance + 1)
+            else:
+                flags[index] = 2
+        pending[index] = inside
+        if win is not None:
+            flags[index] = 2
+            buckets.setdefault(win, []).append((index, WIN))
+        elif inside == 0 and not flags[index]:
+            buckets.setdefault(longest[index], []).append((index, LOSS))
+
+    distance = 0
+    while buckets:
+        for index, result in buckets.pop(distance, ()):
+            if flags[index] == 1:
+                continue
+            flags[index] = 1
+            values[index] = _encode_value(result, distance)
+            for previous in _predecessors(signature, index):
+                if flags[previous] == 1:
+                    continue
+                if result == LOSS:
+                    buckets.setdefault(distance + 1, []).append((previous, WIN))
+                    continue
+                pending[previous] -= 1
+                longest[previous] = max(longest[previous], distance + 1)
+                if pending[previous] == 0 and not flags[previous]:
+                    buckets.setdefault(longest[previous], []).append((previous, LOSS))
+        distance += 1
+
+    temporary = path + '.tmp'
+    with open(temporary, 'wb') as output:
+        output.write(HEADER.pack(MAGIC, *signature))
+        if sys.byteorder == 'big':
+            values.byteswap()
+        values.tofile(output)
+    os.replace(temporary, path)
+    return True
+
+
+"""
+
+_predecessors(signature, index): Private helper that yields the indexes of the
+positions of the same signature that reach this one with one quiet move
+(no capture, no crowning) of the side that just moved.
+
+"""
+
+def _predecessors(signature, index):
+    white, yellow, kings, white_to_move = decode(signature, index)
+    occupied = white | yellow
+    if white_to_move:
+        movers, men_back = yellow, DOWN_DIRECTIONS
+    else:
+        movers, men_back = white, UP_DIRECTIONS
+
+    for sq in iter_bits(movers):
+        bit = 1 << sq
+        for direction in DIRECTIONS if kings & bit else men_back:
+            source = NEIGHBOR[direction][sq]
+            if source < 0 or occupied & (1 << source):
+                continue
+            swap = bit | (1 << source)
+            if white_to_move:
+                previous = (white, yellow ^ swap)
+            else:
+                previous = (white ^ swap, yellow)
+            yield encode(signature, previous[0], previous[1], kings ^ swap if kings & bit else kings,
+                         not white_to_move)
+
+
+"""
+
+generate(directory, max_pieces, workers): Function that solves every
+signature with up to max_pieces pieces, skipping the ones already in
+directory. It returns the number of signatures solved by this run.
+
+"""
+
+def generate(directory, max_pieces=4, workers=None):
+    os.makedirs(directory, exist_ok=True)
+    solved = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for level in signatures(max_pieces):
+            solved += sum(executor.map(solve, level, [directory] * len(level)))
+    return solved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the endgame tablebase.')
+    parser.add_argument('--pieces', type=int, default=4, help='largest number of pieces on the board')
+    parser.add_argument('--output', default='tablebase')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    solved = generate(args.output, args.pieces, args.workers)
+    print('solved %d signatures into %s' % (solved, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import combinations
+import argparse
+import json
+import math
+import os
+import random
+import sys
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from .checkers_alphabeta import AlphaBeta
+from .checkers_iterative import iterative_deepening
+from .checkers_transposition import TranspositionTable
+
+
+"""
+Headless tournament between engine configurations, used to tune the AI.
+Every pair of engines plays the same number of games, spread over a pool
+of worker processes. Games start from short random openings, and each
+opening is played twice with the colors swapped, so neither engine gains
+from a lucky opening or from moving first.
+
+An engine is described as name:key=value,..., with these keys:
+
+    depth   largest search depth
+    time    time budget per move in milliseconds
+    nodes   node budget per move (reproducible, unlike time)
+    eval    leaf evaluation, one of EVALUATIONS
+
+Every finished game is written as one JSON line:
+
+    {"game": 12, "white": "d4", "yellow": "d6", "result": "0-1", "reason": "no moves",
+     "opening": 4, "moves": "21-17 9-13 ..."}
+
+moves lists the moves from the start as from-to dark squares (0..31, see
+checkers_squares), the first "opening" of them being the random opening.
+YELLOW moves first, as in Game. A game that reaches max_plies is a draw.
+
+Results are collected as games finish, with only a few games queued per
+worker, and only the per-pair counts are kept, so memory stays flat however
+many games are played.
+
+    python -m minimax.checkers_tournament --engine d4:depth=4 --engine d6:depth=6 --games 1000 --log games.jsonl
+
+"""
+
+EVALUATIONS = {
+    'default': None,
+    'material': lambda board: board.white_left - board.red_left,
+}
+RESULTS = {WHITE: '1-0', YELLOW: '0-1', None: '1/2-1/2'}
+
+
+class EngineConfig:
+    def __init__(self, name, depth=None, time_ms=None, nodes=None, evaluation='default'):
+        if depth is None and time_ms is None and nodes is None:
+            raise ValueError('engine %s needs a depth, time or nodes limit' % name)
+        if evaluation not in EVALUATIONS:
+            raise ValueError('unknown evaluation %r for engine %s' % (evaluation, name))
+        self.name = name
+        self.depth = depth
+        self.time_ms = time_ms
+        self.nodes = nodes
+        self.evaluation = evaluation
+
+    """
+
+    parse(cls, text): Class method that builds a configuration from its
+    name:key=value,... description.
+
+    """
+
+    @classmethod
+    def parse(cls, text):
+        name, _, options = text.partition(':')
+        keys = {'depth': 'depth', 'time': 'time_ms', 'nodes': 'nodes', 'eval': 'evaluation'}
+        arguments = {}
+        for option in filter(None, options.split(',')):
+            key, _, value = option.partition('=')
+            if key not in keys:
+                raise ValueError('unknown engine option %r in %r' % (key, text))
+            arguments[keys[key]] = value if key == 'eval' else int(value)
+        return cls(name, **arguments)
+
+    def __repr__(self):
+        return 'EngineConfig(%r, depth=%r, time_ms=%r, nodes=%r, evaluation=%r)' % (
+            self.name, self.depth, self.time_ms, self.nodes, self.evaluation)
+
+
+"""
+
+opening(seed, plies): Function that returns a random opening of up to plies
+moves from the start position, the same one for the same seed.
+
+"""
+
+def opening(seed, plies):
+    rng = random.Random(seed)
+    board, color = BitBoard(), YELLOW
+    moves = []
+    for _ in range(plies):
+        legal = board.get_all_moves(color)
+        if not legal or board.winner() != None:
+            break
+        move = rng.choice(legal)
+        board.make_move(move)
+        moves.append(move)
+        color = WHITE if color == YELLOW else YELLOW
+    return moves
+
+
+_searchers = {}
+
+
+def _searcher(config):
+    if config.name not in _searchers:
+        _searchers[config.name] = AlphaBeta(TranspositionTable(1 << 16), evaluate=EVALUATIONS[config.evaluation])
+    searcher = _searchers[config.name]
+    searcher.table.clear()
+    searcher.killers.clear()
+    searcher.history.clear()
+    return searcher
+
+
+"""
+
+play_game(game_id, white, yellow, opening_seed, opening_plies, max_plies):
+Function run in a worker process that plays one game between two engine
+configurations and returns its log record. Each engine starts the game
+with empty tables, so a game only depends on its arguments (and on the
+clock for engines with a time budget).
+
+"""
+
+def play_game(game_id, white, yellow, opening_seed, opening_plies, max_plies):
+    board, color = BitBoard(), YELLOW
+    played = opening(opening_seed, opening_plies)
+    for move in played:
+        board.make_move(move)
+        color = WHITE if color == YELLOW else YELLOW
+    engines = {WHITE: (white, _searcher(white)), YELLOW: (yellow, _searcher(yellow))}
+
+    result, reason = None, 'ply limit'
+    while len(played) < max_plies:
+        if board.winner() != None:
+            result, reason = board.winner(), 'no pieces'
+            break
+        config, searcher = engines[color]
+        _, child, _ = iterative_deepening(board, color == WHITE, None, config.time_ms, config.nodes,
+                                          config.depth or 64, searcher)
+        move = _played_move(board, child, color)
+        if move is None:
+            result, reason = (YELLOW if color == WHITE else WHITE), 'no moves'
+            break
+        board.make_move(move)
+        played.append(move)
+        color = WHITE if color == YELLOW else YELLOW
+
+    return {'game': game_id, 'white': white.name, 'yellow': yellow.name, 'result': RESULTS[result],
+            'reason': reason, 'opening': min(opening_plies, len(played)),
+            'moves': ' '.join('%d-%d' % (move[0], move[1]) for move in played)}
+
+
+def _played_move(board, child, color):
+    if child is None:
+        return None
+    target = (child.white, child.yellow, child.kings)
+    for move in board.get_all_moves(color):
+        undo = board.make_move(move)
+        reached = (board.white, board.yellow, board.kings)
+        board.unmake_move(undo)
+        if reached == target:
+            return move
+    return None
+
+
+"""
+
+schedule(engines, games, seed): Function that yields the play_game
+arguments of a round robin in which every pair of engines plays games
+games, as pairs of games on the same opening with the colors swapped.
+
+"""
+
+def schedule(engines, games, seed=0, opening_plies=4, max_plies=200):
+    game_id = 0
+    for pair in range(0, games, 2):
+        for first, second in combinations(engines, 2):
+            opening_seed = seed * 1000003 + pair
+            for white, yellow in ((first, second), (second, first))[:games - pair]:
+                yield game_id, white, yellow, opening_seed, opening_plies, max_plies
+                game_id += 1
+
+
+"""
+
+elo(wins, draws, losses, z): Function that returns the Elo difference
+implied by a score of wins, draws and losses, with the bounds of its
+confidence interval for the normal quantile z (1.96 for 95%), as
+(elo, low, high). Scores of 0 or 100% give infinite values.
+
+"""
+
+def elo(wins, draws, losses, z=1.96):
+    games = wins + draws + losses
+    if not games:
+        return 0.0, float('-inf'), float('inf')
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = z * math.sqrt(variance / games)
+    return _elo_of(score), _elo_of(score - margin), _elo_of(score + margin)
+
+
+def _elo_of(score):
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return 400 * math.log10(score / (1 - score))
+
+
+class Standings:
+    def __init__(self):
+        self.pairs = {}
+
+    """
+
+    add(self, record): Method that counts a game log record.
+
+    rows(self): Method that returns one (first, second, wins, draws, losses,
+    elo, low, high) row per pair of engines, from the point of view of first.
+
+    """
+
+    def add(self, record):
+        first, second = sorted((record['white'], record['yellow']))
+        counts = self.pairs.setdefault((first, second), [0, 0, 0])
+        if record['result'] == '1/2-1/2':
+            counts[1] += 1
+        elif (record['result'] == '1-0') == (record['white'] == first):
+            counts[0] += 1
+        else:
+            counts[2] += 1
+
+    def rows(self):
+        return [(first, second) + tuple(counts) + elo(*counts)
+                for (first, second), counts in sorted(self.pairs.items())]
+
+    def report(self):
+        lines = []
+        for first, second, wins, draws, losses, difference, low, high in self.rows():
+            lines.append('%s vs %s: +%d =%d -%d  elo %+.0f [%+.0f, %+.0f]'
+                         % (first, second, wins, draws, losses, difference, low, high))
+        return '\n'.join(lines)
+
+
+"""
+
+run_tournament(engines, games, workers, log, seed, ...): Function that
+plays the round robin over a pool of workers, writes each game to the log
+file object (if any) as soon as it finishes and returns the Standings.
+progress, if given, is called with the standings after every game.
+
+"""
+
+def run_tournament(engines, games, workers=None, log=None, seed=0, opening_plies=4, max_plies=200,
+                   progress=None):
+    standings = Standings()
+    workers = workers or os.cpu_count() or 1
+    tasks = schedule(engines, games, seed, opening_plies, max_plies)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = set()
+        for task in tasks:
+            running.add(executor.submit(play_game, *task))
+            if len(running) >= 2 * workers:
+                running = _collect(running, standings, log, progress)
+        while running:
+            running = _collect(running, standings, log, progress)
+    return standings
+
+
+def _collect(running, standings, log, progress):
+    done, running = wait(running, return_when=FIRST_COMPLETED)
+    for future in done:
+        record = future.result()
+        standings.add(record)
+        if log is not None:
+            log.write(json.dumps(record, separators=(',', ':')) + '\n')
+            log.flush()
+        if progress is not None:
+            progress(standings)
+    return running
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a round robin between engine configurations.')
+    parser.add_argument('--engine', action='append', required=True, type=EngineConfig.parse,
+                        help='name:depth=N,time=MS,nodes=N,eval=NAME (at least two)')
+    parser.add_argument('--games', type=int, default=100, help='games per pair of engines')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--log', help='file the games are appended to, one JSON line per game')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--opening-plies', type=int, default=4)
+    parser.add_argument('--max-plies', type=int, default=200)
+    args = parser.parse_args()
+    if len(args.engine) < 2 or len({engine.name for engine in args.engine}) != len(args.engine):
+        parser.error('give at least two engines with different names')
+
+    played = [0]
+
+    def progress(standings):
+        played[0] += 1
+        if played[0] % 50 == 0:
+            print('%d games\n%s' % (played[0], standings.report()), file=sys.stderr)
+
+    log = open(args.log, 'a') if args.log else None
+    try:
+        standings = run_tournament(args.engine, args.games, args.workers, log, args.seed,
+                                   args.opening_plies, args.max_plies, progress)
+    finally:
+        if log is not None:
+            log.close()
+    print(standings.report())
+
+
+if __name__ == '__main__':
+    main()
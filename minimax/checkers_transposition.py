@@ -0,0 +1,130 @@
+"""
+
+Transposition table for the alpha-beta search. Different move orders often
+reach the same position; the table remembers what the search found about a
+position (keyed by its Zobrist hash with the side to move, see
+checkers_zobrist.position_key) so it is not searched again.
+
+Each entry holds (key, depth, bound, score, best_move, generation):
+
+* bound is EXACT, LOWER (the real score is at least score) or UPPER (the
+  real score is at most score).
+* best_move is the (from, to) pair of the best move found, used to search
+  that move first next time.
+* generation is the number of the search that stored the entry.
+
+The table has a fixed number of buckets, so its memory use is bounded no
+matter how long the engine runs. Each bucket has two slots:
+
+1) a depth-preferred slot, replaced only by an entry searched at least as
+deep, by the same position, or when its entry is from an older search.
+2) an always-replace slot that takes every other entry.
+
+The counters hits, misses, stores and overwrites tell how well it works.
+
+"""
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+class TranspositionTable:
+    # Rough size of one stored entry (tuple, key, score and move) plus its slot.
+    ENTRY_BYTES = 200
+    DEFAULT_ENTRIES = 1 << 18
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        if max_entries is None:
+            max_entries = self.DEFAULT_ENTRIES if max_bytes is None else max_bytes // self.ENTRY_BYTES
+        if max_bytes is not None:
+            max_entries = min(max_entries, max_bytes // self.ENTRY_BYTES)
+        if max_entries < 2:
+            raise ValueError('transposition table needs room for at least 2 entries')
+
+        self.buckets = max_entries // 2
+        self.generation = 0
+        self.clear()
+
+    """
+
+    clear(self): Method that empties the table and resets the counters.
+
+    new_search(self): Method to call before each new search; entries from
+    earlier searches become replaceable in the depth-preferred slots.
+
+    """
+
+    def clear(self):
+        self.deep = [None] * self.buckets
+        self.recent = [None] * self.buckets
+        self.hits = self.misses = self.stores = self.overwrites = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    """
+
+    probe(self, key): Method that returns the entry stored for key, or None.
+
+    store(self, key, depth, bound, score, best_move): Method that stores the
+    result of a search following the replacement policy above.
+
+    """
+
+    def probe(self, key):
+        index = key % self.buckets
+        entry = self.deep[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.recent[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, bound, score, best_move):
+        index = key % self.buckets
+        entry = (key, depth, bound, score, best_move, self.generation)
+        self.stores += 1
+
+        current = self.deep[index]
+        if current is None or current[0] == key or depth >= current[1] or current[5] != self.generation:
+            self.deep[index] = entry
+            if current is None or current[0] == key:
+                return
+            # The displaced entry moves down to the always-replace slot.
+            entry = current
+
+        recent = self.recent[index]
+        if recent is not None and recent[0] != entry[0] and recent[0] != key:
+            self.overwrites += 1
+        self.recent[index] = entry
+
+    """
+
+    __len__(self): Returns the number of entries stored.
+
+    capacity(self): Returns the maximum number of entries.
+
+    stats(self): Returns the counters and the fill level as a dictionary.
+
+    """
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.deep) + sum(entry is not None for entry in self.recent)
+
+    def capacity(self):
+        return 2 * self.buckets
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'entries': len(self),
+            'capacity': self.capacity(),
+        }
@@ -0,0 +1,302 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_evaluation import FEATURES, WEIGHTS, WEIGHTS_FILE, weight_vector, save_weights
+from checkers.checkers_pdn import PDNGame, read_games
+from .checkers_batch_eval import square_codes, features
+
+
+"""
+Tuning of the evaluation weights from game results, in the style of the
+Texel method: the evaluation of a position, turned into a probability, is
+fitted to the result of the game the position was played in, over a large
+number of positions.
+
+The games come from tournament logs (see checkers_tournament, which gives
+self-play data when an engine plays itself) or from PDN files (see
+checkers_pdn). Every position of a game is used except the first
+skip_plies (the random openings) and, with quiet, the positions where the
+side to move can capture, whose static score says little about the game.
+Games without a result are skipped. Positions are replayed by a pool of
+worker processes, a chunk of games per task, and kept as (white, yellow,
+kings) masks, 12 bytes per position; the feature matrix (see
+checkers_batch_eval.features) is then built from them in batches.
+
+The model is a logistic regression: the probability that WHITE wins is
+sigmoid(X w), X being the unweighted terms of checkers_evaluation and the
+result counting 1 for a WHITE win, 0.5 for a draw and 0 for a YELLOW win.
+It is fitted by Newton's method, which needs a handful of passes over X,
+and the fitted weights are divided by the material weight so that scores
+stay in pieces. The scale dropped that way is the Texel K constant.
+
+The weights are written to WEIGHTS_FILE, which checkers_evaluation loads
+at startup:
+
+    python -m minimax.checkers_tournament --engine a:depth=4 --engine b:depth=4 --games 20000 --log selfplay.jsonl
+    python -m minimax.checkers_tuning selfplay.jsonl games.pdn
+
+numpy is needed (see checkers_batch_eval).
+
+"""
+
+RESULT_VALUES = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+CHUNK_GAMES = 500
+FEATURE_BATCH = 1 << 16
+
+
+"""
+
+game_positions(game, skip_plies, quiet): Function that returns the
+(white, yellow, kings) masks of the positions of a game used for tuning, as
+a list. game is a PDNGame or a tournament log record.
+
+"""
+
+def game_positions(game, skip_plies=8, quiet=True):
+    masks = []
+    for ply, (board, color, moves) in enumerate(_replay(game)):
+        if ply >= skip_plies and not (quiet and any(move[2] for move in moves)):
+            masks.append((board.white, board.yellow, board.kings))
+    return masks
+
+
+def _replay(game):
+    if isinstance(game, PDNGame):
+        # A PDN game stops at an illegal move: the positions before it are kept.
+        replay = game.replay()
+        while True:
+            try:
+                board, color, _ = next(replay)
+            except (StopIteration, ValueError):
+                return
+            yield board, color, board.get_all_moves(color)
+
+    board, color = BitBoard(), YELLOW
+    for text in game['moves'].split():
+        start, end = (int(sq) for sq in text.split('-'))
+        moves = board.get_all_moves(color)
+        yield board, color, moves
+        for move in moves:
+            if move[0] == start and move[1] == end:
+                board.make_move(move)
+                break
+        else:
+            return
+        color = WHITE if color == YELLOW else YELLOW
+
+
+def _result(game):
+    if isinstance(game, PDNGame):
+        return RESULT_VALUES.get(game.result)
+    return RESULT_VALUES.get(game.get('result'))
+
+
+"""
+
+load_chunk(games, first, skip_plies, quiet): Function run in a worker
+process that returns the masks ((N, 3) uint32 array), results ((N,) float
+array) and game numbers ((N,) int array) of the positions of a list of
+games, the first one being game number first.
+
+"""
+
+def load_chunk(games, first=0, skip_plies=8, quiet=True):
+    masks, results, numbers = [], [], []
+    for number, game in enumerate(games, first):
+        result = _result(game)
+        if result is None:
+            continue
+        positions = game_positions(game, skip_plies, quiet)
+        masks.extend(positions)
+        results.extend([result] * len(positions))
+        numbers.extend([number] * len(positions))
+    return (np.array(masks, dtype=np.uint32).reshape(-1, 3), np.array(results),
+            np.array(numbers, dtype=np.int64))
+
+
+"""
+
+read_game_files(paths): Generator that yields the games of tournament logs
+(JSON lines) and PDN files (ending in .pdn), one at a time.
+
+load_data(paths, skip_plies, quiet, workers, chunk_games): Function that
+replays the games of the files over a pool of workers and returns
+(masks, results, games) for all their positions, games holding the number
+of the game each position comes from.
+
+"""
+
+def read_game_files(paths):
+    for path in paths:
+        with open(path) as games:
+            if path.lower().endswith('.pdn'):
+                yield from read_games(games)
+            else:
+                for line in games:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def load_data(paths, skip_plies=8, quiet=True, workers=None, chunk_games=CHUNK_GAMES):
+    workers = workers or os.cpu_count() or 1
+    columns = ([], [], [])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        chunk, first = [], 0
+        for number, game in enumerate(read_game_files(paths)):
+            chunk.append(game)
+            if len(chunk) < chunk_games:
+                continue
+            pending.append(executor.submit(load_chunk, chunk, first, skip_plies, quiet))
+            chunk, first = [], number + 1
+            if len(pending) >= 2 * workers:
+                _collect(pending.popleft().result(), columns)
+        if chunk:
+            pending.append(executor.submit(load_chunk, chunk, first, skip_plies, quiet))
+        while pending:
+            _collect(pending.popleft().result(), columns)
+    if not columns[0]:
+        return np.zeros((0, 3), dtype=np.uint32), np.zeros(0), np.zeros(0, dtype=np.int64)
+    return tuple(np.concatenate(column) for column in columns)
+
+
+def _collect(result, columns):
+    for column, array in zip(columns, result):
+        column.append(array)
+
+
+"""
+
+feature_matrix(masks): Function that returns the (N, len(FEATURES)) array
+of the unweighted terms of an (N, 3) array of masks, built FEATURE_BATCH
+positions at a time to bound the temporary arrays.
+
+"""
+
+def feature_matrix(masks):
+    matrix = np.empty((len(masks), len(FEATURES)))
+    for start in range(0, len(masks), FEATURE_BATCH):
+        matrix[start:start + FEATURE_BATCH] = features(square_codes(masks[start:start + FEATURE_BATCH]))
+    return matrix
+
+
+"""
+
+log_loss(matrix, results, vector): Function that returns the mean cross
+entropy between the results and sigmoid(matrix @ vector).
+
+fit(matrix, results, iterations, ridge, tolerance): Function that fits the
+logistic regression by Newton's method, with a small ridge penalty that
+keeps it defined when a term never varies, and returns the coefficients.
+
+"""
+
+def log_loss(matrix, results, vector):
+    logits = matrix @ vector
+    return float(np.mean(np.logaddexp(0.0, logits) - results * logits))
+
+
+def fit(matrix, results, iterations=50, ridge=1e-6, tolerance=1e-10):
+    count, width = matrix.shape
+    vector = np.zeros(width)
+    loss = log_loss(matrix, results, vector) + ridge * vector @ vector / 2
+    for _ in range(iterations):
+        probability = 1.0 / (1.0 + np.exp(-(matrix @ vector)))
+        gradient = matrix.T @ (probability - results) / count + ridge * vector
+        hessian = (matrix.T * (probability * (1.0 - probability))) @ matrix / count + ridge * np.eye(width)
+        step = np.linalg.solve(hessian, gradient)
+        # Halve the step until the loss goes down; far from the optimum a
+        # full Newton step can overshoot.
+        for _ in range(30):
+            candidate = vector - step
+            candidate_loss = log_loss(matrix, results, candidate) + ridge * candidate @ candidate / 2
+            if candidate_loss <= loss:
+                break
+            step = step / 2
+        else:
+            break
+        vector, improvement, loss = candidate, loss - candidate_loss, candidate_loss
+        if improvement < tolerance:
+            break
+    return vector
+
+
+"""
+
+tune(masks, results, games, validation, seed): Function that fits the
+weights to the positions and returns (weights, report): the
+{feature: weight} dictionary, scaled so that material weighs 1, and a
+dictionary with the Texel K scale and the training (and validation) loss
+of the current and the tuned weights. The current weights are scored with
+their own best scale. validation is the share of games held out to check
+the fit; whole games are held out, as the positions of one game are too
+alike to test each other.
+
+"""
+
+def tune(masks, results, games, validation=0.1, seed=0):
+    matrix = feature_matrix(masks)
+    numbers = np.unique(games)
+    held = np.random.default_rng(seed).permutation(numbers)[:int(len(numbers) * validation)]
+    in_test = np.isin(games, held)
+    test, train = np.flatnonzero(in_test), np.flatnonzero(~in_test)
+    if not len(train):
+        raise ValueError('no positions to tune on')
+
+    coefficients = fit(matrix[train], results[train])
+    scale = coefficients[FEATURES.index('material')]
+    if scale <= 0:
+        raise ValueError('the results do not favour the side with more material; check the data')
+    weights = {feature: round(float(weight), 4) for feature, weight in zip(FEATURES, coefficients / scale)}
+
+    current = np.array(weight_vector(WEIGHTS))
+    current_scale = fit((matrix[train] @ current)[:, None], results[train])[0]
+    report = {'positions': len(matrix), 'k': float(scale)}
+    for name, rows in (('train', train), ('validation', test)):
+        if len(rows):
+            report[name + '_loss_before'] = log_loss(matrix[rows], results[rows], current * current_scale)
+            report[name + '_loss_after'] = log_loss(matrix[rows], results[rows], coefficients)
+    return weights, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the evaluation weights on game results.')
+    parser.add_argument('games', nargs='+', help='tournament logs (JSON lines) or PDN files (.pdn)')
+    parser.add_argument('--skip-plies', type=int, default=8, help='opening plies of every game not used')
+    parser.add_argument('--all', action='store_true', help='also use positions where a capture is possible')
+    parser.add_argument('--validation', type=float, default=0.1, help='share of games held out')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--output', default=WEIGHTS_FILE, help='weights file to write')
+    parser.add_argument('--dry-run', action='store_true', help='print the weights without writing them')
+    args = parser.parse_args()
+    if not 0 <= args.validation < 1:
+        parser.error('the validation share must be at least 0 and below 1')
+
+    start = time.perf_counter()
+    masks, results, games = load_data(args.games, args.skip_plies, not args.all, args.workers)
+    loaded = time.perf_counter()
+    print('%d positions loaded in %.1f s' % (len(masks), loaded - start), file=sys.stderr)
+    try:
+        weights, report = tune(masks, results, games, args.validation)
+    except ValueError as error:
+        parser.exit(1, 'error: %s\n' % error)
+    print('fitted in %.1f s, K %.3f' % (time.perf_counter() - loaded, report['k']), file=sys.stderr)
+    for name in ('train', 'validation'):
+        if name + '_loss_after' in report:
+            print('%s loss: %.5f -> %.5f' % (name, report[name + '_loss_before'], report[name + '_loss_after']),
+                  file=sys.stderr)
+    print(json.dumps(weights, indent=4))
+    if not args.dry_run:
+        save_weights(weights, args.output)
+        print('written to %s' % args.output, file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from checkers.checkers_bitboard import BitBoard
+from checkers.checkers_constant import YELLOW, WHITE
+from checkers.checkers_squares import row_col, square_of
+from .checkers_alphabeta import AlphaBeta
+from .checkers_book import OpeningBook
+from .checkers_cache import AnalysisCache
+from .checkers_iterative import iterative_deepening
+from .checkers_tablebase import Tablebase
+from .checkers_transposition import TranspositionTable
+
+
+"""
+AIWorker runs the AI search in a separate process so the pygame loop keeps
+drawing and handling events at full rate while the engine thinks. A process
+is used rather than a thread because the search is pure Python and would
+hold the GIL away from the render loop.
+
+The position is sent to the worker as BitBoard.pack() (a few ints) and the
+worker answers with the chosen move as ((from_row, from_col), (to_row, to_col)),
+so it works with any board class on the game side.
+
+Each search is tagged with a generation number kept in shared memory.
+cancel() bumps the generation: the running search notices within a few
+hundred nodes and stops, and its result, if one still arrives, is dropped.
+
+The worker process keeps one AlphaBeta searcher with a TranspositionTable
+for its whole life, so consecutive moves reuse what earlier searches found.
+
+With a book_path, the worker opens that opening book (see checkers_book) and
+plays the book move without searching whenever the position is in it; such
+results report depth 0. With a tablebase_dir, the searcher scores endgame
+positions exactly from that tablebase (see checkers_tablebase).
+
+With a cache_path, the worker keeps its results in that persistent
+analysis cache (see checkers_cache), shared by every game and process that
+opens the same file. A position found there searched to cache_depth or
+deeper is played from the cache without searching, and every search that
+reaches cache_depth is written to it, so the engine no longer starts cold
+on positions an earlier session has seen. Book moves are still looked up
+first.
+
+Pondering uses the opponent's thinking time. ponder() starts a background
+search of the position the opponent has to move in: a first search ranks
+the opponent's replies, then the position after each reply, the most
+likely first, is searched with the time budget of a real move, and the
+result is kept. When the opponent has moved, start() cancels the pondering.
+If the move played is one already pondered, the kept result is returned at
+once. Otherwise the search runs as usual, and still reuses whatever the
+pondering left in the transposition table. The kept results are dropped
+when the next pondering starts.
+
+"""
+
+class AIWorker:
+    def __init__(self, time_limit_ms=1000, book_path=None, tablebase_dir=None, cache_path=None, cache_depth=8):
+        self.time_limit_ms = time_limit_ms
+        self._generation = multiprocessing.Value('i', 0)
+        self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                             initargs=(self._generation, book_path, tablebase_dir, cache_path,
+                                                       cache_depth))
+        self._future = None
+        self._ponder = None
+        self._pondering = None
+
+    """
+
+    start(self, board, max_player): Method that starts searching board in the
+    background, cancelling any search or pondering still running.
+
+    ponder(self, board, max_player): Method that starts pondering board, the
+    position the opponent has to move in; max_player is True when that
+    opponent is WHITE. Calling it again for the same position does nothing,
+    so it can be called every frame of the opponent's turn.
+
+    pending(self): Method that returns True while a search has been started
+    and its result not yet collected by poll.
+
+    poll(self): Method that returns None while the search runs and then,
+    once, its result as (score, move, depth); move is None if the side to
+    move had no legal move.
+
+    """
+
+    def start(self, board, max_player):
+        self.cancel()
+        packed = board.pack() if isinstance(board, BitBoard) else BitBoard.from_board(board).pack()
+        with self._generation.get_lock():
+            generation = self._generation.value
+        self._future = self._executor.submit(_search, packed, max_player, self.time_limit_ms, generation)
+
+    def ponder(self, board, max_player):
+        packed = board.pack() if isinstance(board, BitBoard) else BitBoard.from_board(board).pack()
+        if self._ponder is not None and self._pondering == packed:
+            return
+        self.cancel()
+        with self._generation.get_lock():
+            generation = self._generation.value
+        self._ponder = self._executor.submit(_ponder, packed, max_player, self.time_limit_ms, generation)
+        self._pondering = packed
+
+    def pending(self):
+        return self._future is not None
+
+    def poll(self):
+        if self._future is None or not self._future.done():
+            return None
+        future, self._future = self._future, None
+        return future.result()
+
+    """
+
+    cancel(self): Method that stops the running search or pondering, if any,
+    and forgets it.
+
+    shutdown(self): Method that cancels the search, writes out the results
+    still waiting to go to the analysis cache and stops the worker process.
+    The cancelled search ends within a few milliseconds.
+
+    """
+
+    def cancel(self):
+        if self._future is None and self._ponder is None:
+            return
+        with self._generation.get_lock():
+            self._generation.value += 1
+        for future in (self._future, self._ponder):
+            if future is not None:
+                future.cancel()
+        self._future = self._ponder = self._pondering = None
+
+    def shutdown(self):
+        self.cancel()
+        self._executor.submit(_close_cache)
+        self._executor.shutdown()
+
+
+_generation = None
+_searcher = None
+_book = None
+_cache = None
+_cache_depth = None
+_pondered = {}
+
+
+def _init_worker(generation, book_path, tablebase_dir, cache_path=None, cache_depth=8):
+    global _generation, _searcher, _book, _cache, _cache_depth
+    _generation = generation
+    tablebase = Tablebase(tablebase_dir) if tablebase_dir is not None else None
+    _searcher = AlphaBeta(TranspositionTable(), tablebase)
+    if book_path is not None:
+        _book = OpeningBook(book_path)
+    if cache_path is not None:
+        _cache = AnalysisCache(cache_path)
+        _cache_depth = cache_depth
+
+
+def _close_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+
+
+"""
+
+_search(packed, max_player, time_limit_ms, generation): Function run in the
+worker process. It searches the packed position with iterative deepening
+until the time limit or until the search is cancelled.
+
+"""
+
+def _search(packed, max_player, time_limit_ms, generation):
+    if packed in _pondered:
+        return _pondered.pop(packed)
+
+    def cancelled():
+        return _generation.value != generation
+
+    return _search_position(BitBoard.unpack(packed), max_player, time_limit_ms, cancelled)
+
+
+def _search_position(position, max_player, time_limit_ms, cancelled):
+    color = WHITE if max_player else YELLOW
+    if _book is not None:
+        move, score = _book.lookup(position, color)
+        if move is not None:
+            return score, (row_col(move[0]), row_col(move[1])), 0
+    if _cache is not None:
+        move, score, depth = _cache.lookup(position, color, _cache_depth)
+        if move is not None:
+            return score, (row_col(move[0]), row_col(move[1])), depth
+
+    score, board, depth = iterative_deepening(position, max_player, None, time_limit_ms,
+                                              searcher=_searcher, cancel=cancelled)
+    move = find_move(position, board, color)
+    if _cache is not None and move is not None and depth >= _cache_depth:
+        _cache.store(position, color, depth, score, (square_of(*move[0]), square_of(*move[1])))
+    return score, move, depth
+
+
+"""
+
+_ponder(packed, max_player, time_limit_ms, generation): Function run in the
+worker process that ponders the packed position, in which the opponent is
+to move, until every reply is searched or the pondering is cancelled. The
+result of each finished reply goes to _pondered, keyed by the packed
+position after the reply. It returns the number of replies pondered.
+
+"""
+
+def _ponder(packed, max_player, time_limit_ms, generation):
+    _pondered.clear()
+
+    def cancelled():
+        return _generation.value != generation
+
+    position = BitBoard.unpack(packed)
+    color = WHITE if max_player else YELLOW
+    moves = position.get_all_moves(color)
+    if not moves:
+        return 0
+    _, board, _ = iterative_deepening(position, max_player, None, time_limit_ms,
+                                      searcher=_searcher, cancel=cancelled)
+    likely = find_move(position, board, color)
+    first = None if likely is None else (square_of(*likely[0]), square_of(*likely[1]))
+
+    for move in _searcher.order_moves(position, moves, 0, first):
+        if cancelled():
+            break
+        child = position.apply_move(move)
+        result = _search_position(child, not max_player, time_limit_ms, cancelled)
+        if cancelled():
+            break
+        _pondered[child.pack()] = result
+    return len(_pondered)
+
+
+"""
+
+find_move(position, board, color): Function that returns the move of color
+that turns position into board, as ((from_row, from_col), (to_row, to_col)),
+or None when board is None or no move leads to it.
+
+"""
+
+def find_move(position, board, color):
+    if board is None:
+        return None
+    target = (board.white, board.yellow, board.kings)
+    for move in position.get_all_moves(color):
+        child = position.apply_move(move)
+        if (child.white, child.yellow, child.kings) == target:
+            return row_col(move[0]), row_col(move[1])
+    return None